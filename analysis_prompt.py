@@ -0,0 +1,307 @@
+# analysis_prompt.py
+"""
+The Gemini credibility analysis shared by the text, video and image pipelines:
+prompts, the JSON response schemas Gemini is constrained to, and one parser
+that validates the answer and repairs it once if it comes back malformed.
+"""
+import asyncio
+import json
+import os
+import re
+import chunking
+import metrics
+import resilience
+from concurrency import stage_limits
+
+# --- Configuration ---
+# Gemini 2.5 counts its thinking tokens against this limit too, so leave headroom
+# above the few hundred tokens the JSON answer itself needs.
+ANALYSIS_MAX_OUTPUT_TOKENS = int(os.getenv("ANALYSIS_MAX_OUTPUT_TOKENS", "2048"))
+REPAIR_MAX_OUTPUT_TOKENS = int(os.getenv("REPAIR_MAX_OUTPUT_TOKENS", "512"))
+MAX_CLAIMS = 3
+# Claims extracted from each chunk of a long input before they are merged.
+CHUNK_MAX_CLAIMS = 5
+CHUNK_MAX_OUTPUT_TOKENS = int(os.getenv("CHUNK_MAX_OUTPUT_TOKENS", "1024"))
+
+_CLAIMS = {"type": "ARRAY", "items": {"type": "STRING"}, "max_items": MAX_CLAIMS}
+
+TEXT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER"},
+        "explanation": {"type": "STRING"},
+        "claims": _CLAIMS,
+    },
+    "required": ["score", "explanation", "claims"],
+}
+
+IMAGE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER"},
+        "explanation": {"type": "STRING"},
+        "bias": {"type": "STRING"},
+        "factuality": {"type": "STRING"},
+        "claims": _CLAIMS,
+    },
+    "required": ["score", "explanation", "bias", "factuality", "claims"],
+}
+
+CHUNK_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"claims": {"type": "ARRAY", "items": {"type": "STRING"}, "max_items": CHUNK_MAX_CLAIMS}},
+    "required": ["claims"],
+}
+
+IMAGE_PROMPT = f"""
+Analyze this image for potential misinformation. Answer in JSON:
+score: authenticity from 0 (completely fake/manipulated) to 100 (completely authentic and real).
+explanation: 2-3 sentences.
+bias: the likely political bias or tone of the image's message (e.g., Left-leaning, Neutral, Right-leaning, Satire).
+factuality: e.g., Factual, Misleading, Manipulated.
+claims: up to {MAX_CLAIMS} verifiable claims made by text or context in the image, each one short sentence.
+"""
+
+
+def text_prompt(text: str, domain: str) -> str:
+    return f"""
+Analyze the following text, published on '{domain}', for credibility. Answer in JSON:
+score: credibility from 0 to 100.
+explanation: 2-3 sentences explaining the score.
+claims: up to {MAX_CLAIMS} verifiable claims from the text, each one short sentence.
+
+Here is the text to analyze:
+---
+{text}
+---
+"""
+
+
+def chunk_prompt(chunk: str, index: int, total: int) -> str:
+    return f"""
+This is part {index + 1} of {total} of a longer text. Answer in JSON:
+claims: up to {CHUNK_MAX_CLAIMS} verifiable factual claims made in this part, each one short, self-contained sentence.
+
+---
+{chunk}
+---
+"""
+
+
+def summary_prompt(opening: str, claims: list, domain: str) -> str:
+    listed = "\n".join(f"- {claim}" for claim in claims)
+    return f"""
+Analyze a long text published on '{domain}' for credibility. It is too long to show in full:
+below are its opening and the claims extracted from all of it. Answer in JSON:
+score: credibility from 0 to 100.
+explanation: 2-3 sentences explaining the score.
+claims: the {MAX_CLAIMS} most important verifiable claims, copied from the list.
+
+Opening:
+---
+{opening}
+---
+
+Claims made in the text:
+{listed}
+"""
+
+
+class AnalysisParseError(ValueError):
+    pass
+
+
+def _generation_config(schema: dict, max_output_tokens: int) -> dict:
+    return {
+        "response_mime_type": "application/json",
+        "response_schema": schema,
+        "max_output_tokens": max_output_tokens,
+        "temperature": 0.2,
+    }
+
+
+def _load_json(raw: str) -> dict:
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        # Code fences or chatter around the object: try the outermost {...}.
+        match = re.search(r"\{.*\}", raw, re.DOTALL)
+        if not match:
+            raise AnalysisParseError("AI response was not JSON.")
+        try:
+            data = json.loads(match.group(0))
+        except json.JSONDecodeError as e:
+            raise AnalysisParseError(f"AI response was not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise AnalysisParseError("AI response was not a JSON object.")
+    return data
+
+
+def _text_field(data: dict, key: str) -> str:
+    value = data.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise AnalysisParseError(f"AI response is missing '{key}'.")
+    return value.strip()
+
+
+def parse_analysis(raw: str, schema: dict) -> dict:
+    """
+    Validates a JSON answer against `schema` and returns
+    {"initial_analysis", "claims"[, "source_analysis"]}. Raises AnalysisParseError.
+    """
+    data = _load_json(raw)
+    try:
+        score = max(0, min(100, int(float(data["score"]))))
+    except (KeyError, TypeError, ValueError):
+        raise AnalysisParseError("AI response is missing a numeric 'score'.")
+
+    claims = data.get("claims")
+    if not isinstance(claims, list):
+        raise AnalysisParseError("AI response is missing 'claims'.")
+    seen = set()
+    claims_to_check = []
+    for claim in claims:
+        if not isinstance(claim, str):
+            continue
+        claim = claim.strip()
+        key = claim.lower()
+        if len(claim.split()) > 1 and key not in seen:
+            seen.add(key)
+            claims_to_check.append(claim)
+
+    result = {
+        "initial_analysis": {"credibility_score": score, "explanation": _text_field(data, "explanation")},
+        "claims": claims_to_check[:MAX_CLAIMS],
+    }
+    if "bias" in schema["properties"]:
+        result["source_analysis"] = {
+            "political_bias": _text_field(data, "bias"),
+            "factuality_rating": _text_field(data, "factuality"),
+        }
+    return result
+
+
+def _response_text(response) -> str:
+    # A blocked or empty candidate makes .text raise; there is nothing to repair.
+    try:
+        return response.text
+    except ValueError:
+        feedback = getattr(response, "prompt_feedback", None)
+        raise AnalysisParseError(f"AI returned no answer ({feedback or 'empty response'}).")
+
+
+async def _repair(raw: str, schema: dict, repair_model) -> dict:
+    prompt = (
+        "Rewrite the following into a JSON object with the keys "
+        f"{', '.join(schema['properties'])}. Keep the content; do not add anything.\n---\n{raw}"
+    )
+    async with stage_limits.slot("gemini"):
+        with metrics.timed("gemini_repair"):
+            response = await resilience.gemini.call(lambda: repair_model.generate_content_async(
+                prompt, generation_config=_generation_config(schema, REPAIR_MAX_OUTPUT_TOKENS)
+            ))
+    metrics.record_gemini_usage(repair_model, response)
+    return parse_analysis(_response_text(response), schema)
+
+
+async def generate_analysis(
+    model, contents, schema: dict, repair_model=None, safety_settings=None, timeout: float = None
+) -> dict:
+    """
+    Runs the analysis with a JSON-constrained answer and parses it. A malformed
+    answer gets one cheap repair pass through `repair_model` (text only, small
+    output budget) instead of failing the request and repeating the full call.
+    `timeout` overrides the Gemini per-attempt timeout, e.g. for vision calls.
+    """
+    async with stage_limits.slot("gemini"):
+        with metrics.timed("gemini_analysis"):
+            response = await resilience.gemini.call(lambda: model.generate_content_async(
+                contents,
+                generation_config=_generation_config(schema, ANALYSIS_MAX_OUTPUT_TOKENS),
+                safety_settings=safety_settings,
+            ), timeout)
+    metrics.record_gemini_usage(model, response)
+    raw = _response_text(response)
+    try:
+        return parse_analysis(raw, schema)
+    except AnalysisParseError:
+        if repair_model is None or not raw.strip():
+            raise
+        return await _repair(raw, schema, repair_model)
+
+
+def _claim_words(claim: str) -> set:
+    return set(re.findall(r"\w+", claim.lower()))
+
+
+def merge_claims(claim_lists: list) -> list:
+    """
+    Flattens per-chunk claims in order, dropping ones that repeat an earlier
+    claim (chunks overlap) by exact text or by mostly the same words.
+    """
+    merged = []
+    seen = []
+    for claims in claim_lists:
+        for claim in claims:
+            words = _claim_words(claim)
+            if not words or any(len(words & other) / len(words | other) >= 0.8 for other in seen):
+                continue
+            seen.append(words)
+            merged.append(claim)
+    return merged
+
+
+async def _chunk_claims(model, chunk: str, index: int, total: int, safety_settings) -> list:
+    try:
+        async with stage_limits.slot("gemini"):
+            with metrics.timed("gemini_chunk"):
+                response = await resilience.gemini.call(lambda: model.generate_content_async(
+                    chunk_prompt(chunk, index, total),
+                    generation_config=_generation_config(CHUNK_SCHEMA, CHUNK_MAX_OUTPUT_TOKENS),
+                    safety_settings=safety_settings,
+                ))
+        metrics.record_gemini_usage(model, response)
+        claims = _load_json(_response_text(response)).get("claims")
+    except resilience.DeadlineExceeded:
+        raise
+    except Exception as e:
+        # One bad chunk costs its claims, not the whole analysis.
+        resilience.degrade("claim_extraction", e)
+        return None
+    if not isinstance(claims, list):
+        return None
+    return [claim.strip() for claim in claims if isinstance(claim, str) and len(claim.split()) > 1]
+
+
+async def analyze_text(model, text: str, domain: str, safety_settings=None) -> dict:
+    """
+    Credibility analysis of a text of any length. Short inputs go to Gemini in
+    one request; long ones are split into overlapping chunks whose claims are
+    extracted concurrently, merged and deduplicated, and scored in one final
+    request that sees the opening of the text and the merged claims.
+    """
+    if chunking.estimate_tokens(text) <= chunking.ANALYSIS_DIRECT_MAX_TOKENS:
+        return await generate_analysis(
+            model, text_prompt(text, domain), TEXT_SCHEMA, repair_model=model, safety_settings=safety_settings
+        )
+
+    pieces = chunking.split_text(text)
+    chunks = chunking.spread(pieces)
+    if len(chunks) < len(pieces):
+        # Only an even sample of the text is read; mark the answer partial.
+        resilience.degrade(
+            "chunking", chunking.ChunksDropped(f"Analyzed {len(chunks)} of {len(pieces)} chunks.")
+        )
+    claim_lists = await asyncio.gather(*(
+        _chunk_claims(model, chunk, i, len(chunks), safety_settings) for i, chunk in enumerate(chunks)
+    ))
+    if all(claims is None for claims in claim_lists):
+        raise AnalysisParseError("Claim extraction failed for every chunk of the text.")
+    claims = merge_claims(claims for claims in claim_lists if claims)
+    return await generate_analysis(
+        model,
+        summary_prompt(chunks[0], claims, domain),
+        TEXT_SCHEMA,
+        repair_model=model,
+        safety_settings=safety_settings,
+    )
@@ -0,0 +1,240 @@
+# benchmarks/fakes.py
+"""
+Local stand-ins for every external service the backend calls: Gemini, the
+Fact Check API, WHOIS, yt-dlp, the YouTube transcript API and the Whisper
+pipeline. Each one sleeps for a configurable latency and fails at a
+configurable rate, so load tests measure our code rather than the network.
+
+main builds its Gemini clients on first use and looks WHOIS up per call, so
+install() only has to run before the first request; load_test.py calls it before
+`import main`.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+from dataclasses import dataclass
+from datetime import datetime
+import httpx
+
+
+@dataclass
+class FakeConfig:
+    gemini_ms: float = 800.0
+    vision_ms: float = 1500.0
+    fact_check_ms: float = 150.0
+    whois_ms: float = 300.0
+    ytdlp_ms: float = 200.0
+    transcript_ms: float = 200.0
+    image_fetch_ms: float = 100.0
+    asr_rtf: float = 0.05  # seconds of ASR per second of audio
+    jitter: float = 0.2  # latencies vary uniformly by +/- this fraction
+    error_rate: float = 0.0
+    seed: int = 1234
+
+
+config = FakeConfig()
+_random = random.Random(config.seed)
+
+
+def _delay(ms: float) -> float:
+    return max(0.0, ms * (1 + _random.uniform(-config.jitter, config.jitter)) / 1000)
+
+
+def _fails() -> bool:
+    return _random.random() < config.error_rate
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(repr(value).encode()).hexdigest()[:10]
+
+
+# --- Gemini ---
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class _Response:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = _Usage(prompt_tokens, len(text) // 4)
+
+
+class FakeGenerativeModel:
+    """
+    Answers in the shape the request asks for: the JSON schema in
+    generation_config when there is one, free text otherwise.
+    """
+
+    def __init__(self, model_name: str = "gemini-fake", **kwargs):
+        self.model_name = f"models/{model_name}"
+        self._vision = "pro" in model_name
+
+    async def generate_content_async(self, contents, generation_config=None, safety_settings=None, **kwargs):
+        from google.api_core import exceptions
+
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = " ".join(part for part in parts if isinstance(part, str))
+        has_image = len(parts) > 1
+        await asyncio.sleep(_delay(config.vision_ms if self._vision or has_image else config.gemini_ms))
+        if _fails():
+            raise exceptions.ServiceUnavailable("Injected Gemini failure")
+
+        tag = _digest(prompt)
+        schema = (generation_config or {}).get("response_schema")
+        if schema is None:
+            text = f"A synthetic scene ({tag}). No link to a known news event."
+        else:
+            fields = schema["properties"]
+            answer = {"claims": [f"Claim {i} in benchmark document {tag} is verifiable" for i in range(3)]}
+            if "score" in fields:
+                answer.update(score=_random.randint(0, 100), explanation=f"Synthetic explanation {tag}.")
+            if "bias" in fields:
+                answer.update(bias="Neutral", factuality="Factual")
+            text = json.dumps(answer)
+        return _Response(text, len(prompt) // 4 + (258 if has_image else 0))
+
+
+# --- Fact Check API and image hosts ---
+def make_transport(image_bytes: bytes) -> httpx.MockTransport:
+    """
+    Transport for the shared HTTP client: the Fact Check API and image URLs.
+    """
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "factchecktools.googleapis.com":
+            await asyncio.sleep(_delay(config.fact_check_ms))
+            if _fails():
+                return httpx.Response(503, json={"error": "Injected fact check failure"})
+            query = request.url.params.get("query", "")
+            if int(_digest(query), 16) % 3 == 0:
+                return httpx.Response(200, json={"claims": [{"claimReview": [{
+                    "publisher": {"name": "Bench Checkers"},
+                    "textualRating": "False",
+                    "url": "https://factcheck.example.com/review",
+                }]}]})
+            return httpx.Response(200, json={})
+        await asyncio.sleep(_delay(config.image_fetch_ms))
+        if _fails():
+            return httpx.Response(503)
+        return httpx.Response(200, content=image_bytes, headers={"content-type": "image/jpeg"})
+
+    return httpx.MockTransport(handler)
+
+
+# --- WHOIS ---
+def fake_whois(domain: str, **kwargs):
+    time.sleep(_delay(config.whois_ms))
+    if _fails():
+        raise ConnectionError("Injected WHOIS failure")
+    return types.SimpleNamespace(creation_date=datetime(2000 + int(_digest(domain), 16) % 20, 1, 1))
+
+
+# --- yt-dlp ---
+def make_yt_dlp(video_path: str, duration: float) -> types.ModuleType:
+    """
+    A yt_dlp module whose extractor "resolves" every URL to the local fixture video.
+    """
+    module = types.ModuleType("yt_dlp")
+
+    class DownloadError(Exception):
+        pass
+
+    class YoutubeDL:
+        def __init__(self, opts=None):
+            self.opts = opts or {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download=False):
+            time.sleep(_delay(config.ytdlp_ms))
+            if _fails():
+                raise DownloadError("Injected yt-dlp failure")
+            info = {
+                "id": _digest(url),
+                "extractor_key": "Bench",
+                "duration": duration,
+                "url": video_path,
+                "vcodec": "h264",
+                "acodec": "aac",
+            }
+            if download:
+                # Callers delete downloads when done, so hand out a copy.
+                copy = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False).name
+                shutil.copyfile(video_path, copy)
+                info["requested_downloads"] = [{"filepath": copy}]
+            return info
+
+        def prepare_filename(self, info):
+            return info["requested_downloads"][0]["filepath"]
+
+    module.YoutubeDL = YoutubeDL
+    module.utils = types.SimpleNamespace(DownloadError=DownloadError)
+    return module
+
+
+# --- YouTube transcripts ---
+class FakeYouTubeTranscriptApi:
+    def list(self, video_id):
+        time.sleep(_delay(config.transcript_ms))
+        if _fails():
+            raise ConnectionError("Injected transcript failure")
+        return self
+
+    def find_transcript(self, languages):
+        return self
+
+    def fetch(self):
+        return [
+            types.SimpleNamespace(text=f"Segment {i} of the benchmark video says something checkable.", start=i * 5.0, duration=5.0)
+            for i in range(60)
+        ]
+
+
+# --- Whisper ---
+def fake_asr(inputs, **kwargs):
+    seconds = len(inputs["raw"]) / inputs["sampling_rate"]
+    time.sleep(seconds * config.asr_rtf)
+    return {"chunks": [
+        {"text": f" Spoken sentence {i} of the benchmark clip.", "timestamp": (i * 5.0, (i + 1) * 5.0)}
+        for i in range(max(1, int(seconds // 5)))
+    ]}
+
+
+def install(fake_config: FakeConfig = None):
+    """
+    Patches the fakes into the libraries the backend imports. Call before `import main`.
+    """
+    global config, _random
+    if fake_config is not None:
+        config = fake_config
+    _random = random.Random(config.seed)
+
+    import google.generativeai as genai
+    import whois
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.configure = lambda **kwargs: None
+    whois.whois = fake_whois
+
+
+def install_video(video_path: str, duration: float):
+    """
+    Patches yt-dlp, the transcript API and the ASR pipeline once the fixture video exists.
+    """
+    import video_analyzer
+    sys.modules["yt_dlp"] = make_yt_dlp(video_path, duration)
+    video_analyzer.YouTubeTranscriptApi = FakeYouTubeTranscriptApi
+    video_analyzer._pipes[video_analyzer.MODEL_NAME] = fake_asr
+    if video_analyzer.ASR_SHORT_MODEL:
+        video_analyzer._pipes[video_analyzer.ASR_SHORT_MODEL] = fake_asr
@@ -0,0 +1,45 @@
+# benchmarks/fixtures.py
+"""
+Sample media for the load tests, generated locally on first use so the suite
+never downloads anything: a photo-sized JPEG (Pillow) and a short video with a
+tone track (ffmpeg's test sources, skipped when ffmpeg isn't installed).
+"""
+import os
+import shutil
+import subprocess
+from PIL import Image, ImageDraw
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+VIDEO_SECONDS = 20
+
+
+def image_fixture(path: str = None) -> str:
+    path = path or os.path.join(FIXTURE_DIR, "photo.jpg")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        img = Image.effect_mandelbrot((3000, 2000), (-2.0, -1.2, 1.0, 1.2), 100).convert("RGB")
+        ImageDraw.Draw(img).text((100, 100), "TruthGuard benchmark", fill=(255, 255, 255))
+        img.save(path, "JPEG", quality=90)
+    return path
+
+
+def video_fixture(path: str = None):
+    """
+    Returns the fixture video's path, or None if ffmpeg is unavailable.
+    """
+    path = path or os.path.join(FIXTURE_DIR, "clip.mp4")
+    if os.path.exists(path):
+        return path
+    if shutil.which("ffmpeg") is None:
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:duration={VIDEO_SECONDS}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={VIDEO_SECONDS}",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-g", "50", "-c:a", "aac", "-shortest", path,
+        ],
+        check=True,
+    )
+    return path
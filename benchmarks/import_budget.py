@@ -0,0 +1,84 @@
+# benchmarks/import_budget.py
+"""
+Measures the cold-start cost of `import main` for a text worker in a fresh
+interpreter and fails when it goes over budget or drags in the video stack.
+
+    python benchmarks/import_budget.py --budget-ms 3000
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules a text-only worker must never import at startup.
+HEAVY_MODULES = ("torch", "transformers", "cv2", "yt_dlp")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def measure(module: str):
+    """
+    Returns (total_ms, [(cumulative_ms, name), ...], loaded_packages) for `module`,
+    where the list holds its direct imports.
+    """
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "import-budget")
+    env.setdefault("FACT_CHECK_API_KEY", "import-budget")
+    env["WORKER_ROLE"] = "text"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    # -X importtime prints children before their parent, indented two spaces per
+    # level, so everything between the previous top-level line and `module` is
+    # part of its import tree.
+    total_ms = 0.0
+    children, loaded = [], set()
+    block, block_names = [], set()
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        depth = len(match.group(3))
+        name = match.group(4)
+        if depth > 1:
+            block_names.add(name.split(".")[0])
+            if depth == 3:
+                block.append((cumulative_ms, name))
+            continue
+        if name == module:
+            total_ms, children, loaded = cumulative_ms, block, block_names
+        block, block_names = [], set()
+    return total_ms, children, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "3000")))
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list.")
+    args = parser.parse_args()
+
+    total_ms, children, loaded = measure(args.module)
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for cumulative_ms, name in sorted(children, reverse=True)[:args.top]:
+        print(f"  {cumulative_ms:8.1f} ms  {name}")
+
+    heavy = sorted(loaded.intersection(HEAVY_MODULES))
+    failed = False
+    if heavy:
+        print(f"FAIL: text worker imported {', '.join(heavy)} at startup")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# benchmarks/load_test.py
+"""
+Drives the /v2 endpoints in-process against local fakes of every external
+service (see fakes.py) and reports latency percentiles, throughput and peak RSS
+per scenario. With --baseline it doubles as the release regression gate.
+
+    python benchmarks/load_test.py --requests 100 --concurrency 20
+    python benchmarks/load_test.py --write-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json --tolerance 0.25
+
+By default every request carries a distinct payload and the in-memory caches
+are disabled, so each one runs the full pipeline; --warm repeats one payload
+per scenario to measure the cached/coalesced path instead.
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+import fakes
+import fixtures
+
+SCENARIOS = (
+    "text", "text_long", "source_batch", "image_url", "image_upload", "video_youtube", "video_other",
+)
+VIDEO_SCENARIOS = {"video_youtube", "video_other"}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def reset_peak_rss():
+    # Linux lets a process reset its own high-water mark, so each scenario
+    # reports its own peak. Elsewhere the peak stays cumulative over the run.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux (bytes on macOS).
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def calibrate() -> float:
+    """
+    Milliseconds this host takes for a fixed CPU-bound workload (best of five),
+    so throughput can be compared with a baseline recorded on another machine.
+    """
+    payload = {"urls": [f"https://site-{n}.example.com/page?q={n}" for n in range(200)]}
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(200):
+            json.loads(json.dumps(payload))
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 2)
+
+
+def build_request(scenario: str, i: int, image_bytes: bytes):
+    """
+    (method, path, kwargs for httpx) of request `i`; `i` makes the payload unique.
+    """
+    if scenario == "text":
+        text = f"Benchmark article {i}. " + "The council approved the new budget on Tuesday. " * 40
+        return "POST", "/v2/analyze", {"json": {"text": text, "url": f"https://news-{i}.example.com/story"}}
+    if scenario == "text_long":
+        text = f"Transcript {i}.\n" + "The speaker claims unemployment fell to four percent last year. " * 1500
+        return "POST", "/v2/analyze", {"json": {"text": text, "url": f"https://stream-{i}.example.com/live"}}
+    if scenario == "source_batch":
+        urls = [f"https://site-{i}-{n}.example.com/page" for n in range(50)] + ["https://www.cnn.com/x"]
+        return "POST", "/v2/source_reliability/batch", {"json": {"urls": urls}}
+    if scenario == "image_url":
+        return "POST", "/v2/analyze_image", {"json": {"image_url": f"https://images.example.com/{i}.jpg"}}
+    if scenario == "image_upload":
+        # Bytes after the JPEG end marker make each upload unique without changing its pixels.
+        data = image_bytes + f"bench{i}".encode()
+        return "POST", "/v2/upload_and_analyze_image", {"files": {"file": (f"{i}.jpg", data, "image/jpeg")}}
+    if scenario == "video_youtube":
+        return "POST", "/v2/analyze_video", {"json": {"url": f"https://www.youtube.com/watch?v=bench{i:06d}"}}
+    if scenario == "video_other":
+        return "POST", "/v2/analyze_video", {"json": {"url": f"https://video.example.com/clip/{i}"}}
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+async def run_scenario(client, scenario: str, requests: int, concurrency: int, warm: bool, image_bytes: bytes) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, kwargs = build_request(scenario, 0 if warm else i, image_bytes)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    reset_peak_rss()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughput_rps": round(requests / elapsed, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack_ms: float = 50.0, calibration_ms: float = None) -> list:
+    """
+    Regressions of `results` against `baseline`, as readable strings. Timing
+    regressions must also exceed `slack_ms`, so millisecond-scale scenarios
+    don't fail on scheduler noise. When both sides carry a calibration time,
+    the baseline's timings are scaled to a slower host before comparing.
+    """
+    slowdown = 1.0
+    if calibration_ms and baseline.get("calibration_ms"):
+        slowdown = max(1.0, calibration_ms / baseline["calibration_ms"])
+    failures = []
+    for scenario, result in results.items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if base is None:
+            continue
+        base_p95 = base["p95_ms"] * slowdown
+        base_rps = base["throughput_rps"] / slowdown
+        if result["p95_ms"] > base_p95 * (1 + tolerance) + slack_ms:
+            failures.append(f"{scenario}: p95 {result['p95_ms']} ms > baseline {base_p95:.1f} ms")
+        run_ms = result["requests"] / result["throughput_rps"] * 1000
+        base_run_ms = result["requests"] / base_rps * 1000
+        if result["throughput_rps"] < base_rps * (1 - tolerance) and run_ms - base_run_ms > slack_ms:
+            failures.append(f"{scenario}: throughput {result['throughput_rps']} rps < baseline {base_rps:.2f} rps")
+        if result["error_rate"] > base["error_rate"] + 0.01:
+            failures.append(f"{scenario}: error rate {result['error_rate']} > baseline {base['error_rate']}")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            failures.append(f"{scenario}: peak RSS {result['peak_rss_mb']} MB > baseline {base['peak_rss_mb']} MB")
+    return failures
+
+
+async def run(args, fake_config: fakes.FakeConfig) -> dict:
+    import httpx
+    import main
+
+    image_path = fixtures.image_fixture()
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    video_path = fixtures.video_fixture()
+    if video_path:
+        fakes.install_video(video_path, fixtures.VIDEO_SECONDS)
+
+    results = {}
+    async with main.lifespan(main.app):
+        # Measure steady state, not requests queued behind the first model load.
+        await main.app.state.warm_up
+        await main.app.state.http_client.aclose()
+        main.app.state.http_client = httpx.AsyncClient(transport=fakes.make_transport(image_bytes))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for scenario in args.scenarios:
+                if scenario in VIDEO_SCENARIOS and not video_path:
+                    print(f"{scenario:14} skipped: ffmpeg not installed")
+                    continue
+                result = await run_scenario(client, scenario, args.requests, args.concurrency, args.warm, image_bytes)
+                results[scenario] = result
+                print(
+                    f"{scenario:14} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                    f"p99 {result['p99_ms']:8.1f} ms  {result['throughput_rps']:7.2f} rps  "
+                    f"errors {result['errors']:3}  peak RSS {result['peak_rss_mb']:.0f} MB"
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warm", action="store_true", help="repeat one payload per scenario (caches on)")
+    parser.add_argument("--baseline", help="fail if results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="timing regressions smaller than this pass")
+    parser.add_argument("--write-baseline", help="save the results as a baseline JSON file")
+    parser.add_argument("--json", help="also write the results to this file")
+    for field in dataclasses.fields(fakes.FakeConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=field.default)
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    fake_config = fakes.FakeConfig(**{f.name: getattr(args, f.name) for f in dataclasses.fields(fakes.FakeConfig)})
+    os.chdir(ROOT)
+    os.environ.update({
+        "GEMINI_API_KEY": "bench",
+        "FACT_CHECK_API_KEY": "bench",
+        "WORKER_ROLE": "text",
+        "CACHE_DIR": tempfile.mkdtemp(prefix="truthguard-bench-"),
+    })
+    if not args.warm:
+        for name in ("FACT_CHECK_CACHE_SIZE", "IMAGE_CACHE_SIZE", "DOMAIN_CACHE_SIZE"):
+            os.environ[name] = "0"
+    fakes.install(fake_config)
+
+    calibration_ms = calibrate()
+    results = asyncio.run(run(args, fake_config))
+    report = {
+        "calibration_ms": calibration_ms,
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warm": args.warm,
+            "fakes": dataclasses.asdict(fake_config),
+        },
+        "scenarios": results,
+    }
+    for path in filter(None, (args.json, args.write_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("WARNING: run configuration differs from the baseline's; comparison may not be meaningful.")
+        failures = compare(results, baseline, args.tolerance, args.slack_ms, calibration_ms)
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if failures:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import metrics
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_PATH = os.path.join(CACHE_DIR, "truthguard.sqlite3")
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """
+    Opens a SQLite file in WAL mode so several worker processes can share it.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries expire after `ttl` seconds.
+    Lookups are counted in the cache metrics under `name`, if given.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        if self.name:
+            metrics.record_cache(self.name, entry is not None)
+        return entry[1] if entry is not None else default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    JSON key/value table in a local SQLite file. Every worker process opens the
+    same file, so entries are shared between uvicorn workers and survive restarts.
+    With `max_bytes` set, the least recently read entries are evicted once the
+    stored values grow past that size. With `record` set, lookups are counted in
+    the cache metrics under the table name.
+    """
+
+    _PURGE_EVERY = 256
+
+    def __init__(self, path: str, table: str, ttl: float, max_bytes: int = None, record: bool = True):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.record = record
+        self._local = threading.local()
+        self._writes = 0
+        self._stored = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections can't cross threads or a fork, so keep one per thread and pid.
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = connect_sqlite(self.path)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "size INTEGER NOT NULL DEFAULT 0, accessed_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+        for column in ("size", "accessed_at"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {self.table} ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.max_bytes and row[1] >= time.time():
+                conn.execute(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+        except sqlite3.Error as e:
+            print(f"Cache read failed ({self.table}): {e}")
+            return default
+        hit = row is not None and row[1] >= time.time()
+        if self.record:
+            metrics.record_cache(self.table, hit)
+        return json.loads(row[0]) if hit else default
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, now + self.ttl, len(payload), now),
+            )
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+            if self.max_bytes:
+                self._evict_if_full(conn, len(payload))
+        except sqlite3.Error as e:
+            print(f"Cache write failed ({self.table}): {e}")
+
+    def _stored_bytes(self, conn: sqlite3.Connection) -> int:
+        return conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def _evict_if_full(self, conn: sqlite3.Connection, size: int):
+        # A running estimate of the table size, so most writes skip eviction
+        # entirely. Other workers write to the same file and replaced entries
+        # are counted twice, so the estimate is re-summed every _PURGE_EVERY
+        # writes and before any eviction.
+        if self._stored is None or self._writes % self._PURGE_EVERY == 0:
+            self._stored = self._stored_bytes(conn)
+        else:
+            self._stored += size
+        if self._stored <= self.max_bytes:
+            return
+        self._stored = self._stored_bytes(conn)
+        if self._stored > self.max_bytes:
+            self._evict(conn)
+            self._stored = self._stored_bytes(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        # Keep the most recently read entries whose running total fits in max_bytes.
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS running "
+            f"FROM {self.table}) WHERE running > ?)",
+            (self.max_bytes,),
+        )
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of a shared SQLiteCache. Disk hits are promoted into
+    memory; writes go to both tiers.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, path: str = None):
+        self.name = name
+        self.memory = TTLCache(maxsize, ttl)
+        self.disk = SQLiteCache(path or CACHE_PATH, name, ttl, record=False)
+
+    def peek(self, key, default=None):
+        """Memory-only lookup, cheap enough to call on the event loop."""
+        value = self.memory.get(key)
+        if value is None:
+            # Not counted as a miss: the caller goes on to get().
+            return default
+        metrics.record_cache(self.name, True)
+        return value
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is not None:
+            metrics.record_cache(self.name, True)
+            return value
+        value = self.disk.get(key)
+        metrics.record_cache(self.name, value is not None)
+        if value is None:
+            return default
+        self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+
+class NearDuplicateCache:
+    """
+    In-memory LRU keyed by perceptual hashes (ints). A lookup returns the value
+    of the closest stored hash that differs in at most `max_distance` bits, so
+    re-encoded or resized copies of the same image hit the same entry.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, max_distance: int = 0, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: int, default=None):
+        with self._lock:
+            now = time.monotonic()
+            best_key, best_distance = None, self.max_distance + 1
+            for stored_key, (expires_at, _) in self._data.items():
+                if expires_at < now:
+                    continue
+                distance = (stored_key ^ key).bit_count()
+                if distance < best_distance:
+                    best_key, best_distance = stored_key, distance
+                    if distance == 0:
+                        break
+            if best_key is not None:
+                self._data.move_to_end(best_key)
+                value = self._data[best_key][1]
+        if self.name:
+            metrics.record_cache(self.name, best_key is not None)
+        return value if best_key is not None else default
+
+    def set(self, key: int, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
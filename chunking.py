@@ -0,0 +1,79 @@
+# chunking.py
+
+import os
+import re
+
+# --- Configuration ---
+# Rough characters per token for English prose; only used to size requests.
+CHARS_PER_TOKEN = 4
+# Inputs up to this many tokens are analyzed in one request (the fast path).
+ANALYSIS_DIRECT_MAX_TOKENS = int(os.getenv("ANALYSIS_DIRECT_MAX_TOKENS", "8000"))
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "4000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "200"))
+# Longer inputs are covered by this many evenly spaced chunks, so request count
+# and cost stay bounded however long a livestream transcript gets.
+MAX_CHUNKS = int(os.getenv("MAX_CHUNKS", "12"))
+
+
+class ChunksDropped(Exception):
+    """
+    Reported (not raised) when spread() leaves chunks of a long input unread.
+    """
+
+
+_BREAKS = re.compile(r"\n\s*\n|\n|(?<=[.!?])\s+|\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _break_before(text: str, start: int, end: int) -> int:
+    """
+    The best place to cut text[start:end]: the last paragraph break, else line
+    break, else sentence end, else whitespace in its second half.
+    """
+    if end >= len(text):
+        return len(text)
+    window = text[start:end]
+    half = len(window) // 2
+    for pattern in (r"\n\s*\n", r"\n", r"(?<=[.!?])\s+", r"\s+"):
+        cuts = [m.end() for m in re.finditer(pattern, window) if m.end() > half]
+        if cuts:
+            return start + cuts[-1]
+    return end
+
+
+def split_text(text: str, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list:
+    """
+    Cuts text into chunks of about `chunk_tokens` at natural breaks, each
+    starting `overlap_tokens` before the previous one ended so a claim that
+    straddles a cut still appears whole in one chunk.
+    """
+    size = chunk_tokens * CHARS_PER_TOKEN
+    overlap = min(overlap_tokens * CHARS_PER_TOKEN, size // 2)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = _break_before(text, start, start + size)
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+        # Start the next chunk on a word boundary.
+        match = _BREAKS.search(text, start, end)
+        if match:
+            start = match.end()
+    return [chunk for chunk in chunks if chunk]
+
+
+def spread(chunks: list, limit: int = MAX_CHUNKS) -> list:
+    """
+    At most `limit` chunks, evenly spaced and always including the first and last.
+    """
+    if len(chunks) <= limit:
+        return chunks
+    if limit == 1:
+        return chunks[:1]
+    step = (len(chunks) - 1) / (limit - 1)
+    return [chunks[round(i * step)] for i in range(limit)]
@@ -0,0 +1,95 @@
+# concurrency.py
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+import metrics
+import resilience
+
+
+class StageLimiter:
+    """
+    Separate concurrency limits for the expensive pipeline stages, with the
+    queueing time spent waiting for each one.
+    """
+
+    def __init__(self, limits: dict):
+        self.limits = dict(limits)
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in limits.items()}
+        self._stats = {
+            stage: {"active": 0, "waiting": 0, "acquired": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for stage in limits
+        }
+
+    @asynccontextmanager
+    async def slot(self, stage: str):
+        """
+        Holds one `stage` slot for the block. Yields a list the block can add
+        futures of threads it gave up on to; they can't be stopped, so the slot
+        stays taken until they finish.
+        """
+        semaphore = self._semaphores[stage]
+        stats = self._stats[stage]
+        stats["waiting"] += 1
+        start = time.perf_counter()
+        try:
+            # Queueing counts against the request deadline like any other stage.
+            await resilience.with_timeout(semaphore.acquire())
+        finally:
+            stats["waiting"] -= 1
+        waited = time.perf_counter() - start
+        stats["acquired"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+        metrics.STAGE_WAIT_SECONDS.labels(stage).observe(waited)
+        stats["active"] += 1
+        abandoned = []
+        try:
+            yield abandoned
+        finally:
+            running = [future for future in abandoned if not future.done()]
+            if running:
+                asyncio.gather(*running, return_exceptions=True).add_done_callback(
+                    lambda _: self._release(stage)
+                )
+            else:
+                self._release(stage)
+
+    def _release(self, stage: str):
+        self._stats[stage]["active"] -= 1
+        self._semaphores[stage].release()
+
+    def snapshot(self) -> dict:
+        return {
+            stage: {
+                "limit": self.limits[stage],
+                "active": stats["active"],
+                "waiting": stats["waiting"],
+                "acquired": stats["acquired"],
+                "avg_wait_seconds": round(stats["total_wait"] / stats["acquired"], 4) if stats["acquired"] else 0.0,
+                "max_wait_seconds": round(stats["max_wait"], 4),
+            }
+            for stage, stats in self._stats.items()
+        }
+
+
+# Worker processes on this node (set by gunicorn.conf.py); 1 under plain uvicorn.
+WORKER_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def per_worker(limit: int) -> int:
+    """
+    This process's share of a node-wide limit, at least 1.
+    """
+    return max(1, limit // WORKER_PROCESSES)
+
+
+# Shared by the synchronous endpoints and the job workers so the limits hold
+# for the whole worker process, however the request came in. The configured
+# limits are per node and split evenly across the worker processes.
+stage_limits = StageLimiter({
+    "download": per_worker(int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))),
+    "asr": per_worker(int(os.getenv("ASR_CONCURRENCY", "1"))),
+    "gemini": per_worker(int(os.getenv("GEMINI_CONCURRENCY", "16"))),
+})
@@ -0,0 +1,115 @@
+# domain_intel.py
+
+import os
+from datetime import datetime
+import whois
+from cache import TieredCache
+
+# --- Configuration ---
+WHOIS_SOCKET_TIMEOUT = int(os.getenv("WHOIS_SOCKET_TIMEOUT", "5"))
+DOMAIN_CACHE_TTL = int(os.getenv("DOMAIN_CACHE_TTL", str(7 * 24 * 3600)))
+DOMAIN_CACHE_SIZE = int(os.getenv("DOMAIN_CACHE_SIZE", "2048"))
+
+# Keyed by the tldextract registered domain. WHOIS and the source model are
+# cached separately because they are looked up concurrently.
+whois_cache = TieredCache("domain_whois", DOMAIN_CACHE_SIZE, DOMAIN_CACHE_TTL)
+reliability_cache = TieredCache("source_ratings", DOMAIN_CACHE_SIZE, DOMAIN_CACHE_TTL)
+
+
+def format_domain_age(creation_date) -> str:
+    if not creation_date:
+        return "Unknown"
+    if isinstance(creation_date, str):
+        creation_date = datetime.fromisoformat(creation_date)
+    age_days = (datetime.now(creation_date.tzinfo) - creation_date).days
+    return f"{age_days // 365} years, {(age_days % 365) // 30} months old"
+
+
+def _whois_creation_date(domain: str):
+    # Socket errors are raised rather than parsed as an empty record, so the
+    # caller can tell a WHOIS outage from a domain without a creation date.
+    domain_info = whois.whois(domain, ignore_socket_errors=False, timeout=WHOIS_SOCKET_TIMEOUT)
+    creation_date = domain_info.creation_date
+    # Handle if creation_date is a list
+    if isinstance(creation_date, list):
+        creation_date = creation_date[0]
+    return creation_date.isoformat() if isinstance(creation_date, datetime) else None
+
+
+def _record(creation_date) -> dict:
+    return {"creation_date": creation_date, "domain_age": format_domain_age(creation_date)}
+
+
+def peek_domain_record(domain: str):
+    """
+    Returns the cached WHOIS record from memory, or None. Never touches the network.
+    """
+    entry = whois_cache.peek(domain)
+    return _record(entry["creation_date"]) if entry is not None else None
+
+
+def cached_domain_record(domain: str):
+    """
+    Returns the WHOIS record from memory or the shared store, or None. Never
+    runs WHOIS itself.
+    """
+    entry = whois_cache.get(domain)
+    return _record(entry["creation_date"]) if entry is not None else None
+
+
+def get_domain_record(domain: str) -> dict:
+    """
+    Returns {"creation_date", "domain_age"} for a domain, running WHOIS only on a
+    cache miss. Network errors (OSError) propagate; other failed lookups come
+    back as "Unknown". Neither is cached so a flaky WHOIS server gets retried.
+    """
+    entry = whois_cache.get(domain)
+    if entry is not None:
+        return _record(entry["creation_date"])
+    try:
+        creation_date = _whois_creation_date(domain)
+    except OSError:
+        raise
+    except Exception:
+        return _record(None)
+    whois_cache.set(domain, {"creation_date": creation_date})
+    return _record(creation_date)
+
+
+def _rating_key(domain: str, model_version: str) -> str:
+    # Ratings are per model version so a newly deployed model isn't masked by old entries.
+    return f"{model_version}:{domain}" if model_version else domain
+
+
+def get_source_reliability(domain: str, predict, model_version: str = None) -> tuple:
+    """
+    Returns the cached (bias, factuality) pair for a domain, calling `predict` on a miss.
+    """
+    key = _rating_key(domain, model_version)
+    entry = reliability_cache.get(key)
+    if entry is not None:
+        return entry["bias"], entry["factuality"]
+    bias, factuality = predict(domain)
+    if bias not in ("Error", "N/A"):
+        reliability_cache.set(key, {"bias": bias, "factuality": factuality})
+    return bias, factuality
+
+
+def get_source_reliability_batch(domains: list, predict_batch, model_version: str = None) -> dict:
+    """
+    Batch form of get_source_reliability: cached domains are answered from the
+    cache and all misses go through one `predict_batch` call.
+    """
+    ratings = {}
+    misses = []
+    for domain in domains:
+        entry = reliability_cache.get(_rating_key(domain, model_version))
+        if entry is not None:
+            ratings[domain] = (entry["bias"], entry["factuality"])
+        else:
+            misses.append(domain)
+    for domain, (bias, factuality) in predict_batch(misses).items():
+        ratings[domain] = (bias, factuality)
+        if bias not in ("Error", "N/A"):
+            reliability_cache.set(_rating_key(domain, model_version), {"bias": bias, "factuality": factuality})
+    return ratings
@@ -209,7 +209,9 @@ function displayResults(data) {
             visualItem.className = 'visual-item';
             
             const img = document.createElement('img');
-            img.src = `data:image/jpeg;base64,${item.keyframe_base64}`;
+            img.src = item.keyframe_url
+                ? `http://127.0.0.1:8000${item.keyframe_url}`
+                : `data:${item.keyframe_mime || 'image/jpeg'};base64,${item.keyframe_base64}`;
             
             const contextText = document.createElement('p');
             contextText.textContent = item.context;
@@ -29,12 +29,17 @@ interface AnalysisResult {
     url?: string;
   }>;
   visual_context?: Array<{
-    keyframe_base64: string;
-    context: string;
+    keyframe_base64?: string;
+    keyframe_url?: string;
+    keyframe_mime?: string;
+    context: string | null;
   }>;
   reverse_image_search_url?: string;
 }
 
+// The base URL for your FastAPI backend
+const API_BASE_URL = 'http://127.0.0.1:8000';
+
 export function AnalysisHub() {
   const [activeTab, setActiveTab] = useState('url');
   const [analysisInput, setAnalysisInput] = useState('');
@@ -47,8 +52,6 @@ export function AnalysisHub() {
     setIsAnalyzing(true);
     setResult(null); // Clear previous results
 
-    // The base URL for your FastAPI backend
-    const API_BASE_URL = 'http://127.0.0.1:8000';
     let endpoint = '';
     let body = {};
 
@@ -372,7 +375,11 @@ export function AnalysisHub() {
                     {result.visual_context.map((frame, index) => (
                       <div key={index} className="border rounded-lg p-3">
                         <img
-                          src={`data:image/jpeg;base64,${frame.keyframe_base64}`}
+                          src={
+                            frame.keyframe_url
+                              ? `${API_BASE_URL}${frame.keyframe_url}`
+                              : `data:${frame.keyframe_mime ?? 'image/jpeg'};base64,${frame.keyframe_base64}`
+                          }
                           alt={`Keyframe ${index + 1}`}
                           className="rounded-md mb-2"
                         />
@@ -0,0 +1,51 @@
+# gunicorn.conf.py
+"""
+Multi-worker serving: gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master (preload_app) and the workers are
+forked from it, so the source model and the source index are loaded once per
+node and shared copy-on-write rather than once per worker. Whisper is not: torch
+is kept out of the master, and each WORKER_ROLE=video worker loads its own copy
+after the fork. Each worker runs its own event loop, HTTP client and job runner.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+# One worker per core by default.
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# The app splits its per-node stage limits and ASR threads across this many
+# workers (see concurrency.py), so make sure it sees the count.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Video requests hold a worker's event loop for minutes; only kill a worker
+# whose loop stopped answering, not one that's busy.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Recycle workers after this many requests (plus jitter) to bound slow leaks; 0 disables.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = "-"
+
+# Prometheus metrics from all workers are merged through files in this
+# directory. It must be set before the app (and prometheus_client) is imported,
+# and emptied of the previous run's samples.
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), "truthguard-metrics")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before any worker forks.
+    import main
+    main.prefork()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
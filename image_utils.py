@@ -0,0 +1,129 @@
+# image_utils.py
+
+import io
+import os
+from PIL import Image, ImageOps
+
+# --- Configuration ---
+# Longest side sent to the vision model; larger images only add upload time.
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+# Hard caps on an incoming image: encoded size, and decoded pixel count.
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_MB", "20")) * 1024 * 1024
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+READ_CHUNK_SIZE = 64 * 1024
+# dHash grid size; the hash has HASH_SIZE * HASH_SIZE bits.
+HASH_SIZE = 16
+
+# Pillow refuses images over twice this outright (decompression bombs).
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+
+class ImageRejected(ValueError):
+    """
+    An image we won't decode. `status_code` is the HTTP status to answer with.
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_format(head: bytes):
+    """
+    The image format from its first bytes, or None if it isn't one we accept.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    if head.startswith(b"BM"):
+        return "BMP"
+    return None
+
+
+async def read_limited(chunks, max_bytes: int = IMAGE_MAX_BYTES) -> bytes:
+    """
+    Collects an async iterator of byte chunks, failing as soon as the total goes
+    over `max_bytes` or the first bytes aren't a supported image format.
+    """
+    data = bytearray()
+    sniffed = False
+    async for chunk in chunks:
+        data += chunk
+        if len(data) > max_bytes:
+            raise ImageRejected(f"Image is larger than {max_bytes // (1024 * 1024)} MB.", 413)
+        if not sniffed and len(data) >= 12:
+            if sniff_format(bytes(data[:12])) is None:
+                raise ImageRejected("Unsupported image format.", 415)
+            sniffed = True
+    if not sniffed and sniff_format(bytes(data[:12])) is None:
+        raise ImageRejected("Unsupported image format.", 415)
+    return bytes(data)
+
+
+async def upload_chunks(file, chunk_size: int = READ_CHUNK_SIZE):
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+def decode_image(data: bytes, max_side: int = IMAGE_MAX_SIDE) -> Image.Image:
+    """
+    Decodes an image no larger than needed: the header is checked against the
+    pixel cap before any pixel data is read, JPEGs are decoded at a reduced DCT
+    scale with draft(), and everything else is shrunk right after decoding.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise ImageRejected("Image has too many pixels.", 413)
+    except Exception as e:
+        raise ImageRejected(f"Could not read image: {type(e).__name__} - {e}")
+    if img.format not in ("JPEG", "PNG", "GIF", "WEBP", "BMP"):
+        raise ImageRejected("Unsupported image format.", 415)
+    if img.width * img.height > IMAGE_MAX_PIXELS:
+        raise ImageRejected("Image has too many pixels.", 413)
+    try:
+        img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    except Exception as e:
+        raise ImageRejected(f"Could not read image: {type(e).__name__} - {e}")
+    return img
+
+
+def prepare_image(img: Image.Image, max_side: int = IMAGE_MAX_SIDE) -> Image.Image:
+    """
+    Applies the EXIF orientation, flattens transparency onto white and shrinks
+    the image so its longest side is at most `max_side`. Returns an RGB image.
+    """
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img = ImageOps.contain(img, (max_side, max_side), Image.LANCZOS)
+    return img
+
+
+def dhash(img: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash: one bit per horizontally adjacent pixel pair of a small
+    grayscale copy. Robust to resizing and recompression, so near-duplicate
+    images differ in only a few bits.
+    """
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
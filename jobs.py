@@ -0,0 +1,253 @@
+# jobs.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from cache import CACHE_DIR, connect_sqlite
+
+# --- Configuration ---
+JOB_DB_PATH = os.path.join(CACHE_DIR, "jobs.sqlite3")
+# Every job is a video analysis, so dedicated text workers (WORKER_ROLE=text)
+# run none: claiming one would load torch and Whisper. Video workers run two,
+# and a deployment that doesn't split roles (WORKER_ROLE unset) runs one.
+_DEFAULT_JOB_WORKERS = {"video": "2", "text": "0"}.get(os.getenv("WORKER_ROLE"), "1")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", _DEFAULT_JOB_WORKERS))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(24 * 3600)))
+# Jobs still "running" after this long belonged to a worker that died.
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "3600"))
+# Jobs no worker has claimed after this long are failed instead of waiting forever.
+JOB_QUEUE_TIMEOUT = int(os.getenv("JOB_QUEUE_TIMEOUT", "3600"))
+
+
+class JobStore:
+    """
+    Jobs in a local SQLite file, so every worker process on the node can submit,
+    claim and report on them without an external queue.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = connect_sqlite(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, fingerprint TEXT, status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def submit(self, kind: str, payload: dict, fingerprint: str = None) -> dict:
+        """
+        Queues a job, or returns the queued/running job with the same fingerprint.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if fingerprint:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE fingerprint = ? AND status IN ('queued', 'running')",
+                    (fingerprint,),
+                ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return self.get(row[0])
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, fingerprint, status, payload, created_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, fingerprint, json.dumps(payload), time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(job_id)
+
+    def claim(self):
+        """
+        Atomically moves the oldest queued job to "running" and returns it.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                    (time.time(), row[0]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row[0]) if row else None
+
+    def finish(self, job_id: str, result=None, error: str = None):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (
+                "failed" if error else "succeeded",
+                None if error else json.dumps(result),
+                error,
+                time.time(),
+                job_id,
+            ),
+        )
+
+    def requeue(self, job_id: str):
+        self._connect().execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL WHERE id = ? AND status = 'running'",
+            (job_id,),
+        )
+
+    def get(self, job_id: str):
+        row = self._connect().execute(
+            "SELECT id, kind, status, payload, result, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "payload": json.loads(row[3]),
+            "created_at": row[6],
+            "started_at": row[7],
+            "finished_at": row[8],
+        }
+        if row[4] is not None:
+            job["result"] = json.loads(row[4])
+        if row[5] is not None:
+            job["error"] = row[5]
+        return job
+
+    def counts(self) -> dict:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def cleanup(self):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Worker lost while running the job', finished_at = ? "
+            "WHERE status = 'running' AND started_at < ?",
+            (now, now - JOB_STALE_AFTER),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'No worker picked the job up in time', finished_at = ? "
+            "WHERE status = 'queued' AND created_at < ?",
+            (now, now - JOB_QUEUE_TIMEOUT),
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+            (now - JOB_RETENTION,),
+        )
+
+
+class JobRunner:
+    """
+    A fixed pool of asyncio workers that claim jobs from the store and run the
+    handler registered for their kind. Handlers are called with the job payload
+    as keyword arguments and must return something JSON-serializable.
+    """
+
+    def __init__(self, store: JobStore, handlers: dict, workers: int = JOB_WORKERS):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self._tasks = []
+        self._wakeup = None
+        self._busy = 0
+        self._claimed = 0
+        self._completed = 0
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._last_cleanup = 0.0
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """
+        Wakes idle workers in this process; other processes pick the job up on their next poll.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                await self._idle()
+                continue
+            queue_wait = job["started_at"] - job["created_at"]
+            self._claimed += 1
+            self._total_queue_wait += queue_wait
+            self._max_queue_wait = max(self._max_queue_wait, queue_wait)
+            self._busy += 1
+            try:
+                result = await self.handlers[job["kind"]](**job["payload"])
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so another worker can run it.
+                await asyncio.to_thread(self.store.requeue, job["id"])
+                raise
+            except Exception as e:
+                detail = getattr(e, "detail", None) or f"{type(e).__name__} - {e}"
+                await asyncio.to_thread(self.store.finish, job["id"], error=detail)
+                self._completed += 1
+            else:
+                await asyncio.to_thread(self.store.finish, job["id"], result)
+                self._completed += 1
+            finally:
+                self._busy -= 1
+
+    async def cleanup_if_due(self):
+        """
+        Runs the store's cleanup at most once a minute per process. Also called
+        when jobs are polled, so a process without job workers still expires
+        jobs nobody claims.
+        """
+        if time.monotonic() - self._last_cleanup > 60:
+            self._last_cleanup = time.monotonic()
+            await asyncio.to_thread(self.store.cleanup)
+
+    async def _idle(self):
+        await self.cleanup_if_due()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "busy": self._busy,
+            "completed": self._completed,
+            "avg_queue_wait_seconds": round(self._total_queue_wait / self._claimed, 4) if self._claimed else 0.0,
+            "max_queue_wait_seconds": round(self._max_queue_wait, 4),
+        }
@@ -0,0 +1,122 @@
+# keyframes.py
+
+import io
+import os
+import numpy as np
+from PIL import Image, features
+
+# --- Configuration ---
+# Candidate frames sampled evenly across the video before picking the keyframes.
+KEYFRAME_SAMPLES = int(os.getenv("KEYFRAME_SAMPLES", "12"))
+# Each remote candidate costs an ffmpeg seek over the network, so remote mode
+# samples fewer: twice the default three keyframes.
+KEYFRAME_REMOTE_SAMPLES = int(os.getenv("KEYFRAME_REMOTE_SAMPLES", "6"))
+# Frames closer than this (0..1) to an already chosen one are treated as duplicates.
+KEYFRAME_MIN_DISTANCE = float(os.getenv("KEYFRAME_MIN_DISTANCE", "0.12"))
+# Keyframes returned to clients are re-encoded at this size and quality, so the
+# response no longer grows with the source video's resolution.
+KEYFRAME_THUMB_MAX_SIDE = int(os.getenv("KEYFRAME_THUMB_MAX_SIDE", "480"))
+KEYFRAME_FORMAT = os.getenv("KEYFRAME_FORMAT", "jpeg").lower()
+KEYFRAME_QUALITY = int(os.getenv("KEYFRAME_QUALITY", "70"))
+
+_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+_SIGNATURE_SIZE = 32
+
+
+def sample_positions(num_samples: int = KEYFRAME_SAMPLES) -> list:
+    """
+    Evenly spaced positions (0..1) that skip the very first and last frame.
+    """
+    return [(i + 0.5) / num_samples for i in range(num_samples)]
+
+
+def _thumbnails(frames: list) -> np.ndarray:
+    """
+    Decodes JPEG frames at low resolution into an (n, 32, 32, 3) uint8 array.
+    Image.draft lets the JPEG decoder downscale while decoding.
+    """
+    thumbs = []
+    for frame in frames:
+        img = Image.open(io.BytesIO(frame))
+        img.draft('RGB', (_SIGNATURE_SIZE * 2, _SIGNATURE_SIZE * 2))
+        img = img.convert('RGB').resize((_SIGNATURE_SIZE, _SIGNATURE_SIZE), Image.BILINEAR)
+        thumbs.append(np.asarray(img))
+    return np.stack(thumbs)
+
+
+def frame_distances(thumbs: np.ndarray) -> np.ndarray:
+    """
+    Pairwise visual distance (0..1) between thumbnails: the mean of a 64-bin
+    color-histogram distance and an 8x8 average-hash Hamming distance.
+    """
+    n = len(thumbs)
+    quantized = (thumbs >> 6).astype(np.int64)
+    bins = (quantized[..., 0] * 16 + quantized[..., 1] * 4 + quantized[..., 2]).reshape(n, -1)
+    offsets = (np.arange(n) * 64)[:, None]
+    hist = np.bincount((bins + offsets).ravel(), minlength=n * 64).reshape(n, 64).astype(np.float32)
+    hist /= hist.sum(axis=1, keepdims=True)
+    hist_dist = np.abs(hist[:, None, :] - hist[None, :, :]).sum(axis=2) / 2
+
+    gray = thumbs.mean(axis=3)
+    blocks = gray.reshape(n, 8, _SIGNATURE_SIZE // 8, 8, _SIGNATURE_SIZE // 8).mean(axis=(2, 4))
+    bits = (blocks > blocks.mean(axis=(1, 2), keepdims=True)).reshape(n, 64)
+    hash_dist = (bits[:, None, :] != bits[None, :, :]).mean(axis=2)
+
+    return (hist_dist + hash_dist) / 2
+
+
+def _informative(thumbs: np.ndarray) -> np.ndarray:
+    # Black frames, fades and flat title cards carry nothing for the vision model.
+    luma = thumbs.mean(axis=3)
+    return (luma.mean(axis=(1, 2)) >= 16) & (luma.std(axis=(1, 2)) >= 6)
+
+
+def select_keyframes(frames: list, num_keyframes: int = 3) -> list:
+    """
+    Picks up to `num_keyframes` of the most visually distinct frames and returns
+    their indices in temporal order. Blank frames and near duplicates of an
+    already chosen frame are dropped, so fewer frames may come back.
+    """
+    if not frames:
+        return []
+    thumbs = _thumbnails(frames)
+    distances = frame_distances(thumbs)
+
+    candidates = np.flatnonzero(_informative(thumbs))
+    if candidates.size == 0:
+        candidates = np.arange(len(frames))
+
+    # Greedy farthest-point selection: start from the frame most unlike the rest,
+    # then keep adding the frame furthest from everything chosen so far.
+    sub = distances[np.ix_(candidates, candidates)]
+    chosen = [int(np.argmax(sub.mean(axis=1)))]
+    while len(chosen) < min(num_keyframes, candidates.size):
+        nearest = sub[:, chosen].min(axis=1)
+        nearest[chosen] = -1
+        best = int(np.argmax(nearest))
+        if nearest[best] < KEYFRAME_MIN_DISTANCE:
+            break
+        chosen.append(best)
+
+    return sorted(int(candidates[i]) for i in chosen)
+
+
+def encode_thumbnail(frame: bytes, max_side: int = KEYFRAME_THUMB_MAX_SIDE, fmt: str = KEYFRAME_FORMAT,
+                     quality: int = KEYFRAME_QUALITY) -> tuple:
+    """
+    Re-encodes a JPEG frame as a thumbnail no larger than `max_side` in `fmt`
+    ("jpeg" or "webp"). Returns (bytes, mime type).
+    """
+    if fmt not in _MIME_TYPES or (fmt == "webp" and not features.check("webp")):
+        fmt = "jpeg"
+    img = Image.open(io.BytesIO(frame))
+    img.draft('RGB', (max_side, max_side))
+    img = img.convert('RGB')
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    out = io.BytesIO()
+    if fmt == "webp":
+        img.save(out, "WEBP", quality=quality, method=4)
+    else:
+        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue(), _MIME_TYPES[fmt]
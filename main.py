@@ -1,38 +1,98 @@
+import gc
 import os
-import google.generativeai as genai
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
-import re
 import tldextract
 import asyncio
 import httpx
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 from urllib.parse import urlparse, parse_qs,quote_plus
-import io
 from youtube_transcript_api import YouTubeTranscriptApi, _errors
 from PIL import Image 
-import whois
-from datetime import datetime
-from video_analyzer import analyze_video_url,get_visual_context
-import joblib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import video_analyzer
+from video_analyzer import analyze_video_url,stream_visual_context
+import domain_intel
+from model_registry import ModelRegistry
+from source_index import load_source_index, source_key
+from training.feature_store import open_feature_store
+from cache import NearDuplicateCache, TTLCache
+import image_utils
+import analysis_prompt
+import metrics
+import resilience
+from concurrency import stage_limits
+from jobs import JobStore, JobRunner
+from streaming import collect, merge, single, sse_response
+from singleflight import SingleFlight, normalize_url, request_fingerprint
 #from youtube_transcript_api.exceptions import TranscriptsDisabled, NoTranscriptFound
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client per worker so fact checks and image fetches reuse warm
+    # HTTP/2 connections instead of paying a TLS handshake on every request.
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=30.0,
+        ),
+    )
+    # Load the source model and Gemini clients in the background so the worker
+    # takes traffic at once; under gunicorn the master already did (see prefork).
+    app.state.warm_up = asyncio.create_task(asyncio.to_thread(warm_up))
+    if video_analyzer.WORKER_ROLE == "video":
+        # Dedicated video workers load Whisper, OpenCV and the vision client before
+        # accepting traffic; everyone else loads them on first use. Under gunicorn
+        # this runs in each worker after the fork (see prefork).
+        await asyncio.to_thread(video_analyzer.preload)
+    job_runner.start()
+    yield
+    await job_runner.stop()
+    await app.state.http_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 load_dotenv()
 
 
-try:
-    source_model = joblib.load("training/model.joblib")
-    vectorizer = joblib.load("training/vectorizer.joblib")
-    mlb = joblib.load("training/mlb.joblib")
-    print("✅Custom Source Reliability model loaded successfully.")
-except FileNotFoundError:
-    print("⚠️ Warning: Model files (.joblib) not found. Source analysis will fail.")
-    source_model = None
-    vectorizer = None
-    mlb = None
+def prefork():
+    """
+    Loads the source model and Gemini clients once in the gunicorn master
+    (gunicorn.conf.py), so the forked workers share those pages copy-on-write
+    instead of each loading their own. Whisper is left to each video worker's
+    lifespan: starting torch before a fork can deadlock its OpenMP thread pool
+    in the children.
+    """
+    warm_up()
+    # Objects allocated so far are never collected; keeping the collector off
+    # them stops it from writing to (and so un-sharing) their pages.
+    gc.freeze()
+
+
+# Serves the bundle training/train.py last published and swaps in new ones as
+# they appear; falls back to the legacy training/*.joblib files. Loaded by
+# warm_up() rather than at import, which keeps worker start-up within budget.
+source_models = ModelRegistry()
+
+# Domains with ground-truth labels in the training corpus skip the model entirely.
+known_sources = load_source_index()
+print(f"✅Source index loaded with {len(known_sources)} domains.")
+# Per-domain features of the labeled outlets, memory-mapped and shared by workers.
+source_features = open_feature_store()
+
+# Stage timings: Server-Timing header on every response, histograms on /metrics.
+app.add_middleware(metrics.TimingMiddleware)
+# Every request gets a deadline that bounds each outbound call it makes.
+app.add_middleware(
+    resilience.DeadlineMiddleware,
+    default=resilience.REQUEST_DEADLINE_SECONDS,
+    overrides={"/v2/analyze_video": resilience.VIDEO_DEADLINE_SECONDS},
+)
 
 # CORS
 origins = ["*"]
@@ -46,7 +106,7 @@ app.add_middleware(
 
 # Configure API Keys
 try:
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
     FACT_CHECK_API_KEY = os.environ["FACT_CHECK_API_KEY"]
 except KeyError as e:
     print(f"Error: Environment variable {e} not found.")
@@ -63,143 +123,406 @@ class V2VideoAnalysisRequest(BaseModel):
 class V2ImageAnalysisRequest(BaseModel):
     image_url: str    
 
-model = genai.GenerativeModel('gemini-2.5-flash')
-safety_settings = {
-    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-}
-
-vision_model= genai.GenerativeModel('gemini-2.5-pro')
-safety_settings = {
-    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-}
-
-def predict_source_reliability(domain: str):
-    if not all([source_model, vectorizer, mlb]):
-        return "N/A", "N/A"
+class V2SourceBatchRequest(BaseModel):
+    urls: list[str]
+
+# google.generativeai takes about a second to import, so the clients are built
+# on first use (or by warm_up) instead of when main is imported.
+_gemini_models = {}
+
+def gemini_model(name: str):
+    if name not in _gemini_models:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        _gemini_models[name] = genai.GenerativeModel(name)
+    return _gemini_models[name]
+
+def text_model():
+    return gemini_model('gemini-2.5-flash')
+
+def vision_model():
+    return gemini_model('gemini-2.5-pro')
+
+def safety_settings():
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+    return {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    }
+
+def warm_up():
+    """
+    Loads what importing main leaves for later: the source model and the
+    Gemini clients.
+    """
+    source_models.refresh()
+    text_model()
+    vision_model()
+
+# WHOIS is a blocking socket client; keep it on its own bounded pool so a burst of
+# slow lookups can't starve the default executor used by the other stages.
+whois_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("WHOIS_MAX_WORKERS", "8")), thread_name_prefix="whois"
+)
+
+FACT_LABELS = {"high", "mixed", "low"}
+
+def predict_source_reliability_batch(domains: list, models=None) -> dict:
+    """
+    Rates many domains with a single vectorizer/model pass over the whole sparse
+    matrix. Returns {domain: (bias, factuality)}.
+    """
+    models = models or source_models.current()
+    if models is None:
+        return {domain: ("N/A", "N/A") for domain in domains}
+    if not domains:
+        return {}
     try:
-        processed_domain = vectorizer.transform([domain])
-        prediction_binarized = source_model.predict(processed_domain)
-        prediction_labels = mlb.inverse_transform(prediction_binarized)
-        
-        if prediction_labels and prediction_labels[0]:
-            # The tuple is (fact, bias) based on how we trained it
-            fact_pred, bias_pred = prediction_labels[0]
-            return bias_pred.title(), fact_pred.title()
-        else:
-           
-            return "Not Rated", "Not Rated"
+        with metrics.timed("source_model"):
+            processed_domains = models.vectorizer.transform(domains)
+            prediction_binarized = models.model.predict(processed_domains)
+            prediction_labels = models.mlb.inverse_transform(prediction_binarized)
     except Exception as e:
         print(f"Model prediction failed: {e}")
-        return "Error", "Error"
+        return {domain: ("Error", "Error") for domain in domains}
+
+    ratings = {}
+    for domain, labels in zip(domains, prediction_labels):
+        # The binarizer returns the predicted labels sorted alphabetically, not as
+        # (fact, bias), so tell them apart by vocabulary.
+        fact_pred = next((label for label in labels if label in FACT_LABELS), None)
+        bias_pred = next((label for label in labels if label not in FACT_LABELS), None)
+        if fact_pred or bias_pred:
+            ratings[domain] = (
+                bias_pred.title() if bias_pred else "Not Rated",
+                fact_pred.title() if fact_pred else "Not Rated",
+            )
+        else:
+            ratings[domain] = ("Not Rated", "Not Rated")
+    return ratings
+
+def predict_source_reliability(domain: str, models=None):
+    return predict_source_reliability_batch([domain], models)[domain]
+
+def model_source_reliability_batch(domains: list) -> dict:
+    # Predict and cache with the same model, even if a swap happens in between.
+    models = source_models.current()
+    return domain_intel.get_source_reliability_batch(
+        domains,
+        lambda misses: predict_source_reliability_batch(misses, models),
+        models.version if models else None,
+    )
+
+def model_source_reliability(domain: str) -> tuple:
+    models = source_models.current()
+    return domain_intel.get_source_reliability(
+        domain,
+        lambda d: predict_source_reliability(d, models),
+        models.version if models else None,
+    )
 
 
 # --- Analysis ---
-def run_full_analysis(text: str, url: str):
-    domain = tldextract.extract(url).registered_domain
-
-    bias_from_model, factuality_from_model = predict_source_reliability(domain)
+async def get_domain_age(domain: str) -> str:
+    # Memory hits are answered on the event loop; only misses queue for a WHOIS thread.
+    record = domain_intel.peek_domain_record(domain)
+    if record is None:
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timed("whois"):
+                record = await resilience.whois.call(
+                    lambda: loop.run_in_executor(whois_executor, domain_intel.get_domain_record, domain)
+                )
+        except (resilience.DependencyError, OSError) as e:
+            # The age is a minor signal; report it as unknown rather than fail.
+            resilience.degrade("domain_age", e)
+            return "Unknown"
+    return record["domain_age"]
+
+def source_rating(bias: str, factuality: str, rating_source: str, presence=None) -> dict:
+    # `presence` lists the platforms (facebook, twitter, ...) a labeled outlet is on;
+    # None when the rating comes from the model, which doesn't know.
+    return {
+        "political_bias": bias,
+        "factuality_rating": factuality,
+        "rating_source": rating_source,
+        "presence": list(presence) if presence is not None else None,
+    }
 
-    try:
-        domain_info = whois.whois(domain)
-        creation_date = domain_info.creation_date
-        # Handle if creation_date is a list
-        if isinstance(creation_date, list):
-            creation_date = creation_date[0]
-
-        # Calculate domain age
-        if creation_date:
-            age_days = (datetime.now() - creation_date).days
-            source_age = f"{age_days // 365} years, {(age_days % 365) // 30} months old"
-        else:
-            source_age = "Unknown"
-    except Exception:
-        source_age = "Unknown"
-    full_prompt = f"""
-    Analyze the following text and its source domain. Provide a multi-part analysis. Use '|||' as a separator between each part.
-
-    PART 1: A credibility score from 0 to 100.
-    |||
-    PART 2: A brief, 2-3 sentence explanation for the score.
-    |||
-    PART 3: The political bias of the source domain '{domain}' (e.g., Left-Center, Center, Right).
-    |||
-    PART 4: The factuality rating of the source domain '{domain}' (e.g., High, Mixed, Low).
-    |||
-    PART 5: A list of up to 3 verifiable claims from the text, separated by the newline character '\\n'.
-
-    Here is the text to analyze:
-    ---
-    {text}
-    ---
-    """
-    response = model.generate_content(full_prompt, safety_settings=safety_settings)
-    parts = response.text.split('|||')
-    if len(parts) < 5:
-        raise ValueError("AI response did not have the expected 5 parts.")
-    score_match = re.search(r'\d+', parts[0])
-    score = int(score_match.group(0)) if score_match else 0
-    explanation_clean = parts[1].split(':', 1)[-1].strip()
-    bias_clean = parts[2].split(':', 1)[-1].strip()
-    factuality_clean = parts[3].split(':', 1)[-1].strip()
-    claims_raw = parts[4].split('\n')
-    claims_to_check = [claim.strip() for claim in claims_raw if len(claim.strip().split()) > 1 and "PART 5" not in claim]
-    initial_analysis = {"credibility_score": score, "explanation": explanation_clean}
-    source_analysis = {
-        "political_bias": bias_from_model,
-        "factuality_rating": bias_from_model,
+def model_rating(bias: str, factuality: str) -> dict:
+    # "N/A" means there was no source model to ask, which isn't a model answer.
+    return source_rating(bias, factuality, "model" if bias != "N/A" else "unavailable")
+
+def indexed_rating(key: str, known) -> dict:
+    presence = source_features.presence(key) if source_features is not None else None
+    return source_rating(known.bias, known.factuality, "index", presence)
+
+async def rate_source(domain: str, url: str) -> dict:
+    key = source_key(known_sources, url)
+    known = known_sources.get(key)
+    metrics.record_cache("source_index", known is not None)
+    if known is not None:
+        return indexed_rating(key, known)
+    bias, factuality = await asyncio.to_thread(model_source_reliability, domain)
+    return model_rating(bias, factuality)
+
+async def analyze_source(domain: str, url: str):
+    # WHOIS and the source rating are independent, so run them side by side.
+    source_age, rating = await asyncio.gather(get_domain_age(domain), rate_source(domain, url))
+    return {
+        **rating,
         "domain_age": source_age # New data point
     }
-    return initial_analysis, source_analysis, claims_to_check
+
+async def generate_text_analysis(text: str, domain: str):
+    # Long articles and transcripts are chunked and map-reduced inside.
+    analysis = await analysis_prompt.analyze_text(text_model(), text, domain, safety_settings())
+    return analysis["initial_analysis"], analysis["claims"]
 
 # --- Fact check ---
+# Keyed by normalized claim text; viral claims are checked over and over.
+fact_check_cache = TTLCache(
+    maxsize=int(os.getenv("FACT_CHECK_CACHE_SIZE", "4096")),
+    ttl=int(os.getenv("FACT_CHECK_CACHE_TTL", str(6 * 3600))),
+    name="fact_checks",
+)
+
+def normalize_claim(claim: str) -> str:
+    return " ".join(claim.lower().split()).strip(" .,;:!?\"'-*")
+
 async def run_fact_check(claim: str, client: httpx.AsyncClient):
+    cache_key = normalize_claim(claim)
+    cached = fact_check_cache.get(cache_key)
+    if cached is not None:
+        return {"claim": claim, **cached}
+
     API_ENDPOINT = "https://factchecktools.googleapis.com/v1alpha1/claims:search"
     params = {"query": claim, "key": FACT_CHECK_API_KEY, "languageCode": "en"}
-    try:
+
+    async def lookup():
         response = await client.get(API_ENDPOINT, params=params)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise resilience.TransientHTTPStatus(f"Fact Check API returned {response.status_code}")
         response.raise_for_status()
+        return response
+
+    try:
+        with metrics.timed("fact_check"):
+            response = await resilience.fact_check.call(lookup)
         data = response.json()
         if "claims" in data and data["claims"]:
             review = data["claims"][0].get("claimReview", [{}])[0]
-            return {
-                "claim": claim,
+            result = {
                 "status": "Fact Check Found",
                 "publisher": review.get("publisher", {}).get("name", "N/A"),
                 "rating": review.get("textualRating", "N/A"),
                 "url": review.get("url", "#")
             }
         else:
-            return {"claim": claim, "status": "No Fact Check Found"}
-    except Exception:
+            result = {"status": "No Fact Check Found"}
+    except Exception as e:
+        # Errors are not cached so the claim is retried on the next request.
+        resilience.degrade("fact_check", e)
         return {"claim": claim, "status": "Processing Error"}
+    fact_check_cache.set(cache_key, result)
+    return {"claim": claim, **result}
+
+async def stream_fact_checks(claims: list):
+    """
+    Yields ("fact_check", result) for each claim as soon as its lookup finishes.
+    """
+    client = app.state.http_client
+
+    async def check(index, claim):
+        return {"index": index, **await run_fact_check(claim, client)}
+
+    for next_result in asyncio.as_completed([check(i, claim) for i, claim in enumerate(claims)]):
+        yield "fact_check", await next_result
+
+# --- Pipelines ---
+# Each pipeline is an async generator of (event, data) pairs emitted as soon as
+# each stage finishes. The /stream routes send them as Server-Sent Events; the
+# regular routes fold them into one JSON response with streaming.collect.
+async def stream_claims_analysis(text: str, domain: str):
+    initial_analysis, claims_to_check = await generate_text_analysis(text, domain)
+    yield "initial_analysis", initial_analysis
+    async for event in stream_fact_checks(claims_to_check):
+        yield event
+
+async def stream_text_analysis(text: str, url: str):
+    domain = tldextract.extract(url).registered_domain
+    # The source rating usually lands long before Gemini answers, so it goes out first.
+    async for event in merge(
+        single("source_analysis", analyze_source(domain, url)),
+        stream_claims_analysis(text, domain),
+    ):
+        yield event
+
+# Vision results keyed by the image's dHash. Memes are resubmitted endlessly,
+# re-encoded and resized, so near-duplicates within a few bits share one entry.
+image_analysis_cache = NearDuplicateCache(
+    maxsize=int(os.getenv("IMAGE_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("IMAGE_CACHE_TTL", str(24 * 3600))),
+    max_distance=int(os.getenv("IMAGE_HASH_MAX_DISTANCE", "10")),
+    name="image_analyses",
+)
+
+def preprocess_image(pil_img: Image.Image):
+    pil_img = image_utils.prepare_image(pil_img)
+    return pil_img, image_utils.dhash(pil_img)
+
+async def generate_image_analysis(pil_img: Image.Image) -> dict:
+    # Send the prompt and the image to the vision model; a malformed answer is
+    # repaired by the cheaper text model rather than repeating the vision call.
+    return await analysis_prompt.generate_analysis(
+        vision_model(),
+        [analysis_prompt.IMAGE_PROMPT, pil_img],
+        analysis_prompt.IMAGE_SCHEMA,
+        repair_model=text_model(),
+        timeout=resilience.VISION_TIMEOUT,
+    )
+
+async def stream_image_analysis(pil_img: Image.Image, reverse_image_search_url: str):
+    yield "reverse_image_search_url", reverse_image_search_url
+
+    # Downscale before hashing and uploading; the vision model gains nothing from
+    # full-resolution photos and multi-MB uploads only add latency.
+    with metrics.timed("image_preprocess"):
+        pil_img, image_hash = await asyncio.to_thread(preprocess_image, pil_img)
+    analysis = image_analysis_cache.get(image_hash)
+    if analysis is None:
+        analysis = await generate_image_analysis(pil_img)
+        image_analysis_cache.set(image_hash, analysis)
+
+    yield "initial_analysis", analysis["initial_analysis"]
+    yield "source_analysis", analysis["source_analysis"]
+
+    async for event in stream_fact_checks(analysis["claims"]):
+        yield event
+
+async def read_upload(file: UploadFile) -> bytes:
+    if file.size is not None and file.size > image_utils.IMAGE_MAX_BYTES:
+        raise image_utils.ImageRejected(
+            f"Image is larger than {image_utils.IMAGE_MAX_BYTES // (1024 * 1024)} MB.", 413
+        )
+    return await image_utils.read_limited(image_utils.upload_chunks(file))
+
+async def fetch_image(image_url: str) -> bytes:
+    # Image hosts are arbitrary, so no breaker or retries; just a bound on the
+    # whole transfer, which the client's per-read timeout alone doesn't give.
+    with metrics.timed("image_fetch"):
+        return await resilience.with_timeout(_fetch_image(image_url), resilience.IMAGE_FETCH_TIMEOUT)
+
+async def _fetch_image(image_url: str) -> bytes:
+    # Stream the body so an oversized or non-image response is dropped after its
+    # first chunks instead of being buffered whole.
+    async with app.state.http_client.stream("GET", image_url) as response:
+        response.raise_for_status()
+        length = response.headers.get("content-length", "")
+        if length.isdigit() and int(length) > image_utils.IMAGE_MAX_BYTES:
+            raise image_utils.ImageRejected(
+                f"Image is larger than {image_utils.IMAGE_MAX_BYTES // (1024 * 1024)} MB.", 413
+            )
+        return await image_utils.read_limited(response.aiter_bytes(image_utils.READ_CHUNK_SIZE))
+
+async def decode_image(image_data: bytes) -> Image.Image:
+    with metrics.timed("image_decode"):
+        return await asyncio.to_thread(image_utils.decode_image, image_data)
+
+async def stream_image_url_analysis(image_url: str):
+    pil_img = await decode_image(await fetch_image(image_url))
+    encoded_url = quote_plus(image_url)
+    async for event in stream_image_analysis(pil_img, f"https://lens.google.com/uploadbyurl?url={encoded_url}"):
+        yield event
+
+async def stream_video_analysis(url: str):
+    domain = tldextract.extract(url).registered_domain
+    # Step 1: Start the download/transcript while the source rating is looked up
+    video_task = asyncio.ensure_future(analyze_video_url(url))
+    try:
+        yield "source_analysis", await analyze_source(domain, url)
+        transcript_text, media = await video_task
+    except BaseException:
+        video_task.cancel()
+        # The download may have finished before the cancel landed; its file
+        # is ours to remove then.
+        (outcome,) = await asyncio.gather(video_task, return_exceptions=True)
+        if isinstance(outcome, tuple):
+            outcome[1].cleanup()
+        raise
+
+    events = merge(
+        stream_claims_analysis(transcript_text, domain),
+        stream_visual_context(media),
+    )
+    try:
+        yield "transcription", media.transcription
+        # Step 2: Run the text analysis, fact checks and keyframe vision calls concurrently
+        async for event in events:
+            yield event
+    finally:
+        # Stop the keyframe stream before removing the downloaded video file it reads
+        await events.aclose()
+        media.cleanup()
+
+async def analyze_text(text: str, url: str):
+    return await collect(stream_text_analysis(text, url), "fact_checks")
+
+async def analyze_image(pil_img: Image.Image, reverse_image_search_url: str):
+    return await collect(stream_image_analysis(pil_img, reverse_image_search_url), "fact_checks")
+
+async def analyze_image_url(image_url: str):
+    return await collect(stream_image_url_analysis(image_url), "fact_checks")
+
+async def analyze_video(url: str):
+    return await collect(stream_video_analysis(url), "fact_checks", "visual_context")
 
 # --- Routes ---
+# Identical requests that arrive while one is still running (a link going viral
+# across many extension users) share that single computation.
+inflight = SingleFlight(on_change=metrics.ANALYSES_IN_FLIGHT.set)
+
+async def run_video_job(url: str):
+    key = request_fingerprint("analyze_video", normalize_url(url))
+    with resilience.deadline(resilience.VIDEO_DEADLINE_SECONDS):
+        return await inflight.do(key, lambda: analyze_video(url))
+
+# Long video analyses can be submitted as jobs and polled instead of holding
+# the HTTP connection open; a fixed worker pool bounds how many run at once.
+job_store = JobStore()
+job_runner = JobRunner(job_store, {"analyze_video": run_video_job})
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return metrics.metrics_response()
+
 @app.get("/")
 def read_root():
-    return {"status": "TruthGuard AI v2 Backend is running!"}
+    models = source_models.current()
+    return {
+        "status": "TruthGuard AI v2 Backend is running!",
+        "source_model": models.version if models else None,
+        "dependencies": resilience.breaker_states(),
+    }
+
+def http_error(e: Exception) -> HTTPException:
+    # Fail fast with 503 while a dependency's breaker is open and 504 when the
+    # request ran out of time, so clients and proxies can tell them from bugs.
+    if isinstance(e, resilience.DependencyUnavailable):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, TimeoutError):
+        return HTTPException(status_code=504, detail=f"Timed out: {str(e) or type(e).__name__}")
+    return HTTPException(status_code=500, detail=f"An error occurred: {type(e).__name__} - {e}")
 
 @app.post("/v2/analyze")
 async def analyze_v2(request: V2AnalysisRequest):
+    key = request_fingerprint("analyze", normalize_url(request.url), request.text)
     try:
-        initial_analysis, source_analysis, claims_to_check = run_full_analysis(request.text, request.url)
-        fact_check_results = []
-        if claims_to_check:
-            async with httpx.AsyncClient() as client:
-                fact_check_tasks = [run_fact_check(claim, client) for claim in claims_to_check]
-                fact_check_results = await asyncio.gather(*fact_check_tasks)
-        return {
-            "initial_analysis": initial_analysis,
-            "source_analysis": source_analysis,
-            "fact_checks": fact_check_results
-        }
+        return await inflight.do(key, lambda: analyze_text(request.text, request.url))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {type(e).__name__} - {e}")
+        raise http_error(e)
 
 
 @app.post("/v2/upload_and_analyze_image")
@@ -209,233 +532,166 @@ async def upload_and_analyze_image(file: UploadFile = File(...)):
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
 
-        # Read the uploaded file data
-        image_data = await file.read()
-
-        # Create a PIL Image object from the uploaded data
-        pil_img = Image.open(io.BytesIO(image_data))
-
-        # --- Use the Vision Model with a specific prompt for images ---
-        image_prompt = """
-        Analyze this image for potential misinformation. Provide a multi-part analysis. Use '|||' as a separator.
-
-        PART 1: An authenticity score from 0 to 100, where 0 means completely fake/manipulated and 100 means completely authentic and real.
-        |||
-        PART 2: A brief explanation.
-        |||
-        PART 3: The likely political bias or tone of the image's message (e.g., Left-leaning, Neutral, Right-leaning, Satire).
-        |||
-        PART 4: A factuality rating (e.g., Factual, Misleading, Manipulated).
-        |||
-        PART 5: A list of verifiable claims made by text or context in the image, separated by '\\n'.
-        """
-
-        # Send the prompt and the image to the vision model
-        vision_response = await vision_model.generate_content_async([image_prompt, pil_img])
-        parts = vision_response.text.split('|||')
+        # Read the uploaded file data, in chunks and up to the size cap
+        image_data = await read_upload(file)
 
         # Create a placeholder reverse image search URL (since we don't have a URL for uploaded images)
         reverse_image_search_url = "https://lens.google.com/upload"  # Generic upload URL
 
-        if len(parts) < 5: raise ValueError("AI response for image did not have the expected 5 parts.")
-
-        score_match = re.search(r'\d+', parts[0])
-        score = int(score_match.group(0)) if score_match else 0
-        explanation_clean = parts[1].split(':', 1)[-1].strip()
-        bias_clean = parts[2].split(':', 1)[-1].strip()
-        factuality_clean = parts[3].split(':', 1)[-1].strip()
-        claims_raw = parts[4].split('\n')
-        claims_to_check = [claim.strip() for claim in claims_raw if len(claim.strip().split()) > 1 and "PART 5" not in claim]
-
-        initial_analysis = {"credibility_score": score, "explanation": explanation_clean}
-        source_analysis = {"political_bias": bias_clean, "factuality_rating": factuality_clean}
-
-        fact_check_results = []
-        if claims_to_check:
-            async with httpx.AsyncClient() as client:
-                fact_check_tasks = [run_fact_check(claim, client) for claim in claims_to_check]
-                fact_check_results = await asyncio.gather(*fact_check_tasks)
-
-        final_response = {
-            "initial_analysis": initial_analysis,
-            "source_analysis": source_analysis,
-            "fact_checks": fact_check_results,
-            "reverse_image_search_url": reverse_image_search_url,
-            "filename": file.filename
-        }
-        return final_response
+        async def analyze_upload():
+            return await analyze_image(await decode_image(image_data), reverse_image_search_url)
+
+        key = request_fingerprint("upload_image", image_data)
+        result = await inflight.do(key, analyze_upload)
+        return {**result, "filename": file.filename}
 
+    except HTTPException:
+        raise
+    except image_utils.ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {type(e).__name__} - {e}")
+        raise http_error(e)
 
 @app.post("/v2/analyze_video")
 async def analyze_video_v2(request: V2VideoAnalysisRequest):
-    # Initialize all variables as empty local variables at the beginning of every request
-    video_path = None
-    transcript_text = ""
-    initial_analysis = {}
-    source_analysis = {}
-    claims_to_check = []
-    visual_context = []
-    fact_check_results = []
-
+    key = request_fingerprint("analyze_video", normalize_url(request.url))
     try:
-        # Step 1: Download and extract video transcript
-        transcript_text, video_path = await asyncio.to_thread(analyze_video_url, request.url)
-
-        # Step 2: Initialize local model instances for this request only
-        local_model = genai.GenerativeModel('gemini-2.5-flash')
-        local_safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-
-        # Step 3: Perform text analysis with local variables
-        domain = tldextract.extract(request.url).registered_domain
-        bias_from_model, factuality_from_model = predict_source_reliability(domain)
-
-        try:
-            domain_info = whois.whois(domain)
-            creation_date = domain_info.creation_date
-            if isinstance(creation_date, list):
-                creation_date = creation_date[0]
-            if creation_date:
-                age_days = (datetime.now() - creation_date).days
-                source_age = f"{age_days // 365} years, {(age_days % 365) // 30} months old"
-            else:
-                source_age = "Unknown"
-        except Exception:
-            source_age = "Unknown"
-
-        # Step 4: Create analysis prompt with local variables
-        full_prompt = f"""
-        Analyze the following text and its source domain. Provide a multi-part analysis. Use '|||' as a separator between each part.
-
-        PART 1: A credibility score from 0 to 100.
-        |||
-        PART 2: A brief, 2-3 sentence explanation for the score.
-        |||
-        PART 3: The political bias of the source domain '{domain}' (e.g., Left-Center, Center, Right).
-        |||
-        PART 4: The factuality rating of the source domain '{domain}' (e.g., High, Mixed, Low).
-        |||
-        PART 5: A list of up to 3 verifiable claims from the text, separated by the newline character '\\n'.
-
-        Here is the text to analyze:
-        ---
-        {transcript_text}
-        ---
-        """
-
-        # Step 5: Generate analysis with local model instance
-        response = local_model.generate_content(full_prompt, safety_settings=local_safety_settings)
-        parts = response.text.split('|||')
-        if len(parts) < 5:
-            raise ValueError("AI response did not have the expected 5 parts.")
-
-        score_match = re.search(r'\d+', parts[0])
-        score = int(score_match.group(0)) if score_match else 0
-        explanation_clean = parts[1].split(':', 1)[-1].strip()
-        bias_clean = parts[2].split(':', 1)[-1].strip()
-        factuality_clean = parts[3].split(':', 1)[-1].strip()
-        claims_raw = parts[4].split('\n')
-        claims_to_check = [claim.strip() for claim in claims_raw if len(claim.strip().split()) > 1 and "PART 5" not in claim]
-
-        # Step 6: Create local analysis results
-        initial_analysis = {"credibility_score": score, "explanation": explanation_clean}
-        source_analysis = {
-            "political_bias": bias_from_model,
-            "factuality_rating": factuality_from_model,
-            "domain_age": source_age
-        }
-
-        # Step 7: Get visual context with isolated processing
-        visual_context = await get_visual_context(video_path)
-
-        # Step 8: Perform fact checking with isolated client
-        if claims_to_check:
-            async with httpx.AsyncClient() as client:
-                fact_check_tasks = [run_fact_check(claim, client) for claim in claims_to_check]
-                fact_check_results = await asyncio.gather(*fact_check_tasks)
-
-        # Step 9: Return completely isolated results
-        return {
-            "initial_analysis": initial_analysis,
-            "source_analysis": source_analysis,
-            "fact_checks": fact_check_results,
-            "visual_context": visual_context
-        }
-
+        return await inflight.do(key, lambda: analyze_video(request.url))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {type(e).__name__} - {e}")
-    finally:
-        # Clean up the downloaded video file
-        if video_path and os.path.exists(video_path):
-            os.remove(video_path)
+        raise http_error(e)
 
 
 @app.post("/v2/analyze_image")
 async def analyze_image_v2(request: V2ImageAnalysisRequest):
+    key = request_fingerprint("analyze_image", normalize_url(request.image_url))
     try:
-        # Use httpx to download the image data from the URL
-        async with httpx.AsyncClient() as client:
-            response = await client.get(request.image_url)
-            response.raise_for_status()
-            image_data = response.content
-
-        # Create a PIL Image object from the downloaded data
-        pil_img = Image.open(io.BytesIO(image_data))
-        
-        # --- Use the Vision Model with a specific prompt for images ---
-        image_prompt = """
-        Analyze this image for potential misinformation. Provide a multi-part analysis. Use '|||' as a separator.
-
-        PART 1: An authenticity score from 0 to 100, where 0 means completely fake/manipulated and 100 means completely authentic and real.
-        |||
-        PART 2: A brief explanation.
-        |||
-        PART 3: The likely political bias or tone of the image's message (e.g., Left-leaning, Neutral, Right-leaning, Satire).
-        |||
-        PART 4: A factuality rating (e.g., Factual, Misleading, Manipulated).
-        |||
-        PART 5: A list of verifiable claims made by text or context in the image, separated by '\\n'.
-        """
-        
-        # Send the prompt and the image to the vision model
-        vision_response = await vision_model.generate_content_async([image_prompt, pil_img])
-        parts = vision_response.text.split('|||')
-        
-        encoded_url = quote_plus(request.image_url)
-        reverse_image_search_url = f"https://lens.google.com/uploadbyurl?url={encoded_url}"
-        
-        if len(parts) < 5: raise ValueError("AI response for image did not have the expected 5 parts.")
-        
-        score_match = re.search(r'\d+', parts[0])
-        score = int(score_match.group(0)) if score_match else 0
-        explanation_clean = parts[1].split(':', 1)[-1].strip()
-        bias_clean = parts[2].split(':', 1)[-1].strip()
-        factuality_clean = parts[3].split(':', 1)[-1].strip()
-        claims_raw = parts[4].split('\n')
-        claims_to_check = [claim.strip() for claim in claims_raw if len(claim.strip().split()) > 1 and "PART 5" not in claim]
-
-        initial_analysis = {"credibility_score": score, "explanation": explanation_clean}
-        source_analysis = {"political_bias": bias_clean, "factuality_rating": factuality_clean}
-
-        fact_check_results = []
-        if claims_to_check:
-            async with httpx.AsyncClient() as client:
-                fact_check_tasks = [run_fact_check(claim, client) for claim in claims_to_check]
-                fact_check_results = await asyncio.gather(*fact_check_tasks)
-        
-        final_response = {
-            "initial_analysis": initial_analysis,
-            "source_analysis": source_analysis,
-            "fact_checks": fact_check_results,
-            "reverse_image_search_url": reverse_image_search_url
-        }
-        return final_response
+        return await inflight.do(key, lambda: analyze_image_url(request.image_url))
+    except image_utils.ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise http_error(e)
+
+
+@app.post("/v2/jobs/analyze_video", status_code=202)
+async def submit_video_job(request: V2VideoAnalysisRequest):
+    key = request_fingerprint("analyze_video", normalize_url(request.url))
+    job = await asyncio.to_thread(job_store.submit, "analyze_video", {"url": request.url}, key)
+    job_runner.notify()
+    return {"job_id": job["id"], "status": job["status"], "status_url": f"/v2/jobs/{job['id']}"}
+
+
+@app.get("/v2/jobs/stats")
+async def job_stats():
+    counts = await asyncio.to_thread(job_store.counts)
+    return {
+        "queue_depth": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "jobs": counts,
+        "workers": job_runner.stats(),
+        "stages": stage_limits.snapshot(),
+    }
+
 
+@app.get("/v2/jobs/{job_id}")
+async def get_job(job_id: str):
+    await job_runner.cleanup_if_due()
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if "result" in job:
+        response["result"] = job["result"]
+    if "error" in job:
+        response["error"] = job["error"]
+    return response
+
+
+# Keyframe ids are content hashes, so a response never changes: clients may
+# cache it forever and revalidation only needs the id.
+KEYFRAME_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+@app.get("/v2/keyframes/{keyframe_id}")
+async def get_keyframe(keyframe_id: str, request: Request):
+    if len(keyframe_id) != 32 or not all(c in "0123456789abcdef" for c in keyframe_id):
+        raise HTTPException(status_code=404, detail="Keyframe not found.")
+    etag = f'"{keyframe_id}"'
+    headers = {**KEYFRAME_CACHE_HEADERS, "ETag": etag}
+    if_none_match = request.headers.get("if-none-match", "")
+    if any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    keyframe = await asyncio.to_thread(video_analyzer.get_keyframe, keyframe_id)
+    if keyframe is None:
+        raise HTTPException(status_code=404, detail="Keyframe not found.")
+    data, mime = keyframe
+    return Response(content=data, media_type=mime, headers=headers)
+
+
+MAX_BATCH_URLS = int(os.getenv("MAX_BATCH_URLS", "500"))
+
+def rate_sources(urls: list) -> dict:
+    url_domains = {url: source_key(known_sources, url) for url in urls}
+    domains = sorted({domain for domain in url_domains.values() if domain})
+    unknown = [domain for domain in domains if domain not in known_sources]
+    predicted = model_source_reliability_batch(unknown)
+    sources = {}
+    for domain in domains:
+        known = known_sources.get(domain)
+        if known is not None:
+            rating = indexed_rating(domain, known)
+        else:
+            rating = model_rating(*predicted[domain])
+        # Only ages already known are reported; a batch never waits on WHOIS.
+        record = domain_intel.cached_domain_record(tldextract.extract(domain).registered_domain)
+        sources[domain] = {**rating, "domain_age": record["domain_age"] if record else None}
+    return {"urls": url_domains, "sources": sources}
+
+
+@app.post("/v2/source_reliability/batch")
+async def source_reliability_batch(request: V2SourceBatchRequest):
+    """
+    Rates every link on a page in one request: URLs are mapped to their
+    registered domain (or a subdomain the index labels separately), and each
+    distinct domain is rated once.
+    """
+    if len(request.urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_URLS} URLs per batch.")
+    try:
+        return await asyncio.to_thread(rate_sources, request.urls)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {type(e).__name__} - {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred: {type(e).__name__} - {e}")
+
+
+# --- Streaming routes ---
+# Same analyses as above, sent stage by stage as Server-Sent Events: source
+# rating first, then the Gemini analysis, then each fact check and keyframe as
+# it completes, and a final "done" (or "error") event.
+@app.post("/v2/analyze/stream")
+async def analyze_v2_stream(request: V2AnalysisRequest):
+    return sse_response(stream_text_analysis(request.text, request.url))
+
+
+@app.post("/v2/analyze_video/stream")
+async def analyze_video_v2_stream(request: V2VideoAnalysisRequest):
+    return sse_response(stream_video_analysis(request.url))
+
+
+@app.post("/v2/analyze_image/stream")
+async def analyze_image_v2_stream(request: V2ImageAnalysisRequest):
+    return sse_response(stream_image_url_analysis(request.image_url))
+
+
+@app.post("/v2/upload_and_analyze_image/stream")
+async def upload_and_analyze_image_stream(file: UploadFile = File(...)):
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    try:
+        pil_img = await decode_image(await read_upload(file))
+    except image_utils.ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return sse_response(stream_image_analysis(pil_img, "https://lens.google.com/upload"))
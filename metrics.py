@@ -0,0 +1,178 @@
+# metrics.py
+"""
+Per-stage timings for every request: Prometheus histograms and counters for
+/metrics, and a Server-Timing header on each response listing the stages that
+request went through. Optionally profiles a sample of requests with pyinstrument
+and keeps the reports of the slow ones.
+"""
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# --- Configuration ---
+# Profile this fraction of requests (0 disables) and keep reports of those slower than the threshold.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "5000"))
+PROFILE_DIR = os.path.join(os.getenv("CACHE_DIR", ".cache"), "profiles")
+# Set (by gunicorn.conf.py) when several worker processes serve the app: every
+# process writes its samples there and /metrics adds them up.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+REQUEST_SECONDS = Histogram(
+    "truthguard_request_seconds", "End-to-end request latency.", ["route", "status"], buckets=_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "truthguard_requests_in_flight", "HTTP requests being handled.", multiprocess_mode="livesum"
+)
+# Distinct analyses running after identical requests are coalesced; set up by main.
+ANALYSES_IN_FLIGHT = Gauge(
+    "truthguard_analyses_in_flight", "Distinct analyses running.", multiprocess_mode="livesum"
+)
+STAGE_SECONDS = Histogram(
+    "truthguard_stage_seconds", "Time spent in each pipeline stage.", ["stage"], buckets=_BUCKETS
+)
+STAGE_WAIT_SECONDS = Histogram(
+    "truthguard_stage_wait_seconds", "Time spent queueing for a stage concurrency slot.", ["stage"],
+    buckets=_BUCKETS,
+)
+GEMINI_TOKENS = Counter("truthguard_gemini_tokens_total", "Gemini tokens used.", ["model", "kind"])
+CACHE_LOOKUPS = Counter("truthguard_cache_lookups_total", "Cache lookups by result.", ["cache", "result"])
+RETRIES = Counter("truthguard_retries_total", "Retried and hedged dependency calls.", ["dependency", "kind"])
+CIRCUIT_OPEN = Gauge(
+    "truthguard_circuit_open", "Worker processes whose circuit breaker for a dependency is open.", ["dependency"],
+    multiprocess_mode="livesum",
+)
+DEGRADED = Counter("truthguard_degraded_total", "Stages answered without their dependency.", ["stage"])
+
+# (stage, seconds) pairs of the current request, read by the Server-Timing middleware.
+_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Times the enclosed block as `stage`. Works around awaits and inside
+    asyncio.to_thread, which carries the request's context into the thread.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_gemini_usage(model, response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    name = getattr(model, "model_name", "unknown").removeprefix("models/")
+    GEMINI_TOKENS.labels(name, "prompt").inc(getattr(usage, "prompt_token_count", 0) or 0)
+    GEMINI_TOKENS.labels(name, "output").inc(getattr(usage, "candidates_token_count", 0) or 0)
+
+
+def metrics_response() -> Response:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+
+def server_timing(timings: list, total: float) -> str:
+    """
+    One entry per stage, durations summed over its calls (concurrent calls can
+    add up to more than the total).
+    """
+    stages = {}
+    for stage, seconds in timings:
+        count, duration = stages.get(stage, (0, 0.0))
+        stages[stage] = (count + 1, duration + seconds)
+    entries = [
+        f'{stage};desc="{count} calls";dur={duration * 1000:.1f}' if count > 1 else f"{stage};dur={duration * 1000:.1f}"
+        for stage, (count, duration) in stages.items()
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        print("⚠️ Warning: PROFILE_SAMPLE_RATE is set but pyinstrument is not installed.")
+        return None
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def _save_profile(profiler, route: str, total: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{route.strip('/').replace('/', '_') or 'root'}-{total:.1f}s.html"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(profiler.output_html())
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware that collects the stage timings of each request, adds them
+    as a Server-Timing header and records request latency and in-flight counts.
+    Streaming responses send their headers before the stages run, so their
+    header only carries what finished before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+        profiler = _start_profiler() if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE else None
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                header = server_timing(timings, time.perf_counter() - start)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _timings.reset(token)
+            total = time.perf_counter() - start
+            # Label by route template so path parameters don't explode the series count.
+            matched = scope.get("route")
+            route_label = getattr(matched, "path", None) or "unmatched"
+            REQUEST_SECONDS.labels(route_label, str(status["code"])).observe(total)
+            if profiler is not None:
+                profiler.stop()
+                if total * 1000 >= PROFILE_SLOW_MS:
+                    _save_profile(profiler, route_label, total)
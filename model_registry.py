@@ -0,0 +1,146 @@
+# model_registry.py
+
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+import joblib
+
+# --- Configuration ---
+MODEL_DIR = os.getenv("MODEL_DIR", "training/artifacts")
+# How often (seconds) a worker checks whether CURRENT points at a new bundle.
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "10"))
+# Memory-map the models' numpy arrays so every worker process on the node reads
+# the same page-cache pages instead of holding its own copy.
+MODEL_MMAP = os.getenv("MODEL_MMAP", "1") == "1"
+LEGACY_DIR = "training"
+POINTER_FILE = "CURRENT"
+BUNDLE_FILE = "bundle.joblib"
+MMAP_BUNDLE_FILE = "bundle.mmap.joblib"
+
+
+class SourceModel(NamedTuple):
+    model: object
+    vectorizer: object
+    mlb: object
+    version: str
+    manifest: dict
+
+
+def _load(path: str):
+    return joblib.load(path, mmap_mode="r" if MODEL_MMAP else None)
+
+
+def _mmap_copy(bundle_dir: str) -> str:
+    """
+    Path of the bundle's uncompressed copy (compressed pickles can't be
+    memory-mapped), written next to it for bundles published without one.
+    """
+    path = os.path.join(bundle_dir, MMAP_BUNDLE_FILE)
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(joblib.load(os.path.join(bundle_dir, BUNDLE_FILE)), tmp)
+        os.replace(tmp, path)
+    return path
+
+
+def load_bundle(artifacts_dir: str, version: str) -> SourceModel:
+    bundle_dir = os.path.join(artifacts_dir, version)
+    path = os.path.join(bundle_dir, BUNDLE_FILE)
+    if MODEL_MMAP:
+        try:
+            path = _mmap_copy(bundle_dir)
+        except OSError as e:
+            print(f"⚠️ Warning: Could not write an uncompressed copy of bundle {version}, loading it unmapped: {e}")
+    bundle = _load(path)
+    with open(os.path.join(bundle_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    return SourceModel(bundle["model"], bundle["vectorizer"], bundle["mlb"], version, manifest)
+
+
+def load_legacy(legacy_dir: str = LEGACY_DIR) -> SourceModel:
+    """
+    The three unversioned joblib files written by older versions of train.py.
+    """
+    return SourceModel(
+        _load(os.path.join(legacy_dir, "model.joblib")),
+        _load(os.path.join(legacy_dir, "vectorizer.joblib")),
+        _load(os.path.join(legacy_dir, "mlb.joblib")),
+        "legacy",
+        {},
+    )
+
+
+class ModelRegistry:
+    """
+    Serves the bundle named by <artifacts_dir>/CURRENT and swaps to a new one
+    when train.py moves the pointer, without restarting the worker. Falls back
+    to the legacy joblib files when no bundle has been published.
+    """
+
+    def __init__(self, artifacts_dir: str = MODEL_DIR, reload_interval: float = MODEL_RELOAD_INTERVAL):
+        self.artifacts_dir = artifacts_dir
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._pointer_mtime = None
+        self._checked_at = 0.0
+        self._missing_reported = False
+
+    def _pointer_version(self):
+        path = os.path.join(self.artifacts_dir, POINTER_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None, None
+        with open(path) as f:
+            return f.read().strip(), mtime
+
+    def refresh(self):
+        """
+        Loads the bundle CURRENT points at if it changed. A bundle that fails to
+        load is reported and the model already being served is kept.
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        version, mtime = self._pointer_version()
+        if self._current is not None and mtime == self._pointer_mtime:
+            self._checked_at = time.monotonic()
+            return self._current
+        self._pointer_mtime = mtime
+        if version and (self._current is None or self._current.version != version):
+            try:
+                self._current = load_bundle(self.artifacts_dir, version)
+                print(f"✅Source model bundle {version} loaded.")
+            except Exception as e:
+                print(f"⚠️ Warning: Could not load source model bundle {version}: {e}")
+        if self._current is None:
+            try:
+                self._current = load_legacy()
+                print("✅Custom Source Reliability model loaded successfully.")
+            except FileNotFoundError:
+                if not self._missing_reported:
+                    self._missing_reported = True
+                    print("⚠️ Warning: Model files (.joblib) not found. Source analysis will fail.")
+        # Only stamped once the load is over: until then current() keeps
+        # waiting for it rather than serving without a model.
+        self._checked_at = time.monotonic()
+        return self._current
+
+    def current(self):
+        """
+        The model to serve right now, or None if there is none. Before the
+        first model has loaded this waits for the load in progress (or runs
+        it); afterwards a reload in progress is never waited for.
+        """
+        if self._current is None:
+            return self.refresh()
+        if time.monotonic() - self._checked_at >= self.reload_interval and self._lock.acquire(blocking=False):
+            try:
+                return self._refresh()
+            finally:
+                self._lock.release()
+        return self._current
@@ -0,0 +1,359 @@
+# resilience.py
+"""
+Bounds on every outbound call: a per-request deadline that each stage's
+timeout is clipped to, retries and hedged requests paid for out of a shared
+retry budget, and a circuit breaker per dependency so an outage fails fast
+instead of holding workers. Stages that can do without a dependency degrade
+instead of failing and the response is marked partial.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+import httpx
+import metrics
+
+# --- Configuration ---
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+VIDEO_DEADLINE_SECONDS = float(os.getenv("VIDEO_DEADLINE_SECONDS", "600"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "45"))
+VISION_TIMEOUT = float(os.getenv("VISION_TIMEOUT", "90"))
+GEMINI_RETRIES = int(os.getenv("GEMINI_RETRIES", "2"))
+# Send a second, identical request if the first hasn't answered after this many
+# seconds; 0 disables. Off for Gemini by default since every hedge is billed.
+GEMINI_HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", "0"))
+FACT_CHECK_TIMEOUT = float(os.getenv("FACT_CHECK_TIMEOUT", "5"))
+FACT_CHECK_RETRIES = int(os.getenv("FACT_CHECK_RETRIES", "1"))
+FACT_CHECK_HEDGE_AFTER = float(os.getenv("FACT_CHECK_HEDGE_AFTER", "1"))
+WHOIS_TIMEOUT = float(os.getenv("WHOIS_TIMEOUT", "5"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "15"))
+TRANSCRIPT_TIMEOUT = float(os.getenv("TRANSCRIPT_TIMEOUT", "20"))
+# yt-dlp and ffmpeg give up on a stalled socket after this many seconds.
+MEDIA_SOCKET_TIMEOUT = float(os.getenv("MEDIA_SOCKET_TIMEOUT", "15"))
+KEYFRAME_FETCH_TIMEOUT = float(os.getenv("KEYFRAME_FETCH_TIMEOUT", "20"))
+# Retries and hedges may add at most this fraction on top of first attempts,
+# plus a small steady allowance so a quiet worker can still retry.
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class DependencyError(Exception):
+    pass
+
+
+class DependencyTimeout(DependencyError, TimeoutError):
+    pass
+
+
+class DependencyUnavailable(DependencyError):
+    """
+    Raised without calling the dependency while its circuit breaker is open.
+    """
+
+
+# --- Deadlines ---
+# Absolute time.monotonic() by which the current request must finish.
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+# Stages of the current request that degraded instead of failing.
+_degraded = contextvars.ContextVar("degraded_stages", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Sets the deadline of the enclosed block, never later than an outer one.
+    Tasks and threads started inside inherit it.
+    """
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(min(current, new) if current is not None else new)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """
+    Seconds left before the deadline, or None outside of one.
+    """
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def stage_timeout(timeout: float = None):
+    """
+    `timeout` clipped to what is left of the deadline. Raises DeadlineExceeded
+    once it has passed, so no new stage starts late.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded.")
+    return left if timeout is None else min(timeout, left)
+
+
+async def with_timeout(awaitable, timeout: float = None):
+    """
+    Awaits `awaitable` for at most stage_timeout(timeout) seconds.
+    """
+    limit = stage_timeout(timeout)
+    try:
+        return await asyncio.wait_for(awaitable, limit)
+    except TimeoutError:
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded("Request deadline exceeded.")
+        raise
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving each request a deadline: `default` seconds, or the
+    value of the longest matching path prefix in `overrides`.
+    """
+
+    def __init__(self, app, default: float = REQUEST_DEADLINE_SECONDS, overrides: dict = None):
+        self.app = app
+        self.default = default
+        self.overrides = sorted((overrides or {}).items(), key=lambda item: -len(item[0]))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        seconds = next((s for prefix, s in self.overrides if scope["path"].startswith(prefix)), self.default)
+        with deadline(seconds):
+            await self.app(scope, receive, send)
+
+
+# --- Degradation ---
+def track_degradation() -> list:
+    """
+    Starts recording degraded stages for the current task and the tasks it
+    starts. Returns the list they are recorded in.
+    """
+    degraded = []
+    _degraded.set(degraded)
+    return degraded
+
+
+def degrade(stage: str, error: Exception):
+    print(f"⚠️ {stage} degraded: {type(error).__name__} - {error}")
+    metrics.DEGRADED.labels(stage).inc()
+    degraded = _degraded.get()
+    if degraded is not None and stage not in degraded:
+        degraded.append(stage)
+
+
+# --- Retry budget and circuit breakers ---
+class RetryBudget:
+    """
+    Token bucket shared by every dependency: each first attempt deposits
+    `ratio` tokens, each retry or hedge spends one, and `min_per_second`
+    trickle in over time. Under a widespread outage retries stop at roughly
+    `ratio` of the traffic instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(10.0, min_per_second * 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.min_per_second + amount)
+        self._updated = now
+
+    def record_attempt(self):
+        self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed calls (retries included, a call
+    counts once); after `reset_seconds` lets a single trial call through and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> tuple:
+        """
+        (allowed, trial): whether a call may go ahead, and whether it is the
+        single trial call let through while half-open. Only the caller that was
+        granted the trial may end it.
+        """
+        state = self.state
+        if state == "half_open":
+            self._trial = True
+            return True, True
+        return state == "closed", False
+
+    def end_trial(self):
+        self._trial = False
+
+    def record_success(self):
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        metrics.CIRCUIT_OPEN.labels(self.name).set(0)
+
+    def record_failure(self):
+        self._consecutive += 1
+        self._trial = False
+        if self._opened_at is not None or self._consecutive >= self.failures:
+            if self._opened_at is None:
+                print(f"⚠️ Circuit for {self.name} opened after {self._consecutive} failures.")
+            self._opened_at = time.monotonic()
+            metrics.CIRCUIT_OPEN.labels(self.name).set(1)
+
+
+class Dependency:
+    """
+    One external service: calls get a timeout clipped to the request deadline,
+    transient failures are retried with jittered backoff, slow calls can be
+    hedged, and all of it goes through the service's circuit breaker.
+    """
+
+    def __init__(self, name: str, timeout: float, retries: int = 0, hedge_after: float = 0.0, transient: tuple = ()):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge_after = hedge_after
+        self.transient = (TimeoutError, OSError, *transient)
+        self.breaker = CircuitBreaker(name)
+
+    async def call(self, fn, timeout: float = None):
+        """
+        Runs `fn`, a function returning a fresh awaitable per attempt. Raises
+        DependencyUnavailable while the breaker is open and DependencyTimeout
+        when an attempt times out; other errors propagate as raised.
+        """
+        allowed, trial = self.breaker.allow()
+        if not allowed:
+            raise DependencyUnavailable(f"{self.name} is unavailable (circuit open).")
+        budget.record_attempt()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    result = await with_timeout(self._hedged(fn), timeout or self.timeout)
+                except DeadlineExceeded:
+                    raise
+                except self.transient as e:
+                    # A trial call is a single probe; other calls retry while
+                    # the breaker and the retry budget allow it.
+                    allowed = False
+                    if attempt < self.retries and not trial:
+                        allowed, trial = self.breaker.allow()
+                    if not allowed or not budget.try_spend():
+                        # One failure per call, however many attempts it made.
+                        self.breaker.record_failure()
+                        trial = False
+                        if isinstance(e, TimeoutError):
+                            raise DependencyTimeout(f"{self.name} timed out.") from e
+                        raise
+                    attempt += 1
+                    metrics.RETRIES.labels(self.name, "retry").inc()
+                    await asyncio.sleep(stage_timeout(random.uniform(0, 0.2 * 2 ** attempt)))
+                    continue
+                except Exception:
+                    # The service answered, just not with what we wanted.
+                    self.breaker.record_success()
+                    trial = False
+                    raise
+                self.breaker.record_success()
+                trial = False
+                return result
+        finally:
+            # A trial call cut short by the deadline or a cancellation proves
+            # nothing either way; let the next call try again.
+            if trial:
+                self.breaker.end_trial()
+
+    async def _hedged(self, fn):
+        if not self.hedge_after:
+            return await fn()
+        first = asyncio.ensure_future(fn())
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done and budget.try_spend():
+                metrics.RETRIES.labels(self.name, "hedge").inc()
+                tasks.add(asyncio.ensure_future(fn()))
+            # First success wins; an error only counts once every attempt has failed.
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def _gemini_transient() -> tuple:
+    from google.api_core import exceptions
+    return (
+        exceptions.ServiceUnavailable,
+        exceptions.InternalServerError,
+        exceptions.DeadlineExceeded,
+        exceptions.ResourceExhausted,
+    )
+
+
+class TransientHTTPStatus(Exception):
+    """
+    A 429 or 5xx answer; raised by callers so it counts as a failure.
+    """
+
+
+budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND)
+
+gemini = Dependency("gemini", GEMINI_TIMEOUT, GEMINI_RETRIES, GEMINI_HEDGE_AFTER, _gemini_transient())
+fact_check = Dependency(
+    "fact_check", FACT_CHECK_TIMEOUT, FACT_CHECK_RETRIES, FACT_CHECK_HEDGE_AFTER,
+    (httpx.TransportError, TransientHTTPStatus),
+)
+whois = Dependency("whois", WHOIS_TIMEOUT)
+youtube_transcripts = Dependency("youtube_transcripts", TRANSCRIPT_TIMEOUT)
+
+
+def breaker_states() -> dict:
+    return {dep.name: dep.breaker.state for dep in (gemini, fact_check, whois, youtube_transcripts)}
@@ -0,0 +1,78 @@
+# singleflight.py
+
+import asyncio
+import hashlib
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+# Query parameters that change per share/click but not the content behind the URL.
+_TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "si", "feature", "ref", "ref_src", "t"}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller starts the
+    computation and every duplicate that arrives while it is running awaits the
+    same result (or exception) instead of starting its own. `on_change` is
+    called with the number of distinct calls in flight whenever it changes.
+    """
+
+    def __init__(self, on_change=None):
+        self._calls = {}
+        self._on_change = on_change
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change(len(self._calls))
+
+    async def do(self, key: str, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self._changed()
+        # Shield so a disconnecting client only cancels its own wait, not the
+        # computation the other callers are sharing.
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            self._changed()
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved when every waiter has gone away.
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for deduplication: lowercase scheme and host, no
+    fragment, tracking parameters removed and the remaining query sorted.
+    """
+    parsed = urlparse(url.strip())
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith("utm_")
+    )
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host == "m.youtube.com":
+        host = "youtube.com"
+    netloc = f"{host}:{parsed.port}" if parsed.port else host
+    return urlunparse((parsed.scheme.lower(), netloc, parsed.path.rstrip("/") or "/", "", urlencode(query), ""))
+
+
+def request_fingerprint(kind: str, *parts) -> str:
+    """
+    Key for one analysis request: a digest over its parts, e.g. the normalized
+    URL and the article text, or the raw bytes of an uploaded image.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return f"{kind}:{digest.hexdigest()}"
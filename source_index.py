@@ -0,0 +1,82 @@
+# source_index.py
+"""
+Exact-match lookup of the source ratings we already have ground truth for.
+
+The index is precomputed from the labels in training/data/corpus.tsv:
+
+    python source_index.py
+
+and loaded once at startup, so known outlets get their labeled rating in O(1)
+and only unseen domains go through the TF-IDF/LinearSVC model.
+
+Most outlets are labeled by registered domain, but some are labeled by host
+(news.harvard.edu, timesofindia.indiatimes.com) and say nothing about the rest
+of their registered domain, so lookups go through source_key().
+"""
+import csv
+import json
+import os
+from typing import NamedTuple
+import tldextract
+
+SOURCE_INDEX_PATH = os.getenv("SOURCE_INDEX_PATH", "training/source_index.json")
+CORPUS_PATH = "training/data/corpus.tsv"
+
+
+class SourceRating(NamedTuple):
+    bias: str
+    factuality: str
+
+
+def build_source_index(corpus_path: str = CORPUS_PATH) -> dict:
+    domains = {}
+    with open(corpus_path, newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            domain = row["source_url_normalized"].strip().lower()
+            domains[domain] = [row["fact"], row["bias"]]
+
+    return {
+        "version": 2,
+        "fields": ["fact", "bias"],
+        "domains": dict(sorted(domains.items())),
+    }
+
+
+def source_key(index: dict, url: str) -> str:
+    """
+    The key `url` is rated under: its host or the nearest parent domain that
+    has its own entry in `index`, otherwise its registered domain.
+    """
+    parts = tldextract.extract(url)
+    domain = parts.registered_domain
+    if domain and parts.subdomain:
+        labels = parts.subdomain.lower().split(".")
+        for i in range(len(labels)):
+            host = ".".join(labels[i:] + [domain])
+            if host in index:
+                return host
+    return domain
+
+
+def load_source_index(path: str = SOURCE_INDEX_PATH) -> dict:
+    """
+    Returns {domain: SourceRating}, or an empty index if the file is missing.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ Warning: Source index {path} not found. All domains will use the model.")
+        return {}
+    # Version 1 files also carried presence bits, now read from the feature store.
+    return {
+        domain: SourceRating(bias=bias.title(), factuality=fact.title())
+        for domain, (fact, bias, *_) in data["domains"].items()
+    }
+
+if __name__ == "__main__":
+    index = build_source_index()
+    with open(SOURCE_INDEX_PATH, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+        f.write("\n")
+    print(f"✅ Wrote {len(index['domains'])} domains to {SOURCE_INDEX_PATH}")
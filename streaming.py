@@ -0,0 +1,104 @@
+# streaming.py
+
+import asyncio
+import json
+from fastapi.responses import StreamingResponse
+import resilience
+
+# Events that are list items in the final JSON response, and the key they collect under.
+LIST_EVENTS = {"fact_check": "fact_checks", "keyframe": "visual_context"}
+
+
+async def single(event: str, awaitable):
+    """
+    An event stream of one event, emitted when `awaitable` resolves.
+    """
+    yield event, await awaitable
+
+
+async def merge(*streams):
+    """
+    Runs several (event, data) async generators concurrently and yields their
+    events in the order they are produced.
+    """
+    queue = asyncio.Queue()
+    done = object()
+
+    async def pump(stream):
+        try:
+            async for item in stream:
+                await queue.put(item)
+        except BaseException as e:
+            await queue.put(e)
+            return
+        await queue.put(done)
+
+    tasks = [asyncio.ensure_future(pump(stream)) for stream in streams]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Wait for the pumps to unwind, so nothing still reads the sources'
+        # resources once the caller cleans them up.
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def collect(events, *list_keys) -> dict:
+    """
+    Folds an event stream into the single JSON response of the non-streaming
+    endpoints. List items carry an "index" so they land in their original order.
+    "partial" is set when a stage degraded, and "degraded" lists which ones.
+    """
+    degraded = resilience.track_degradation()
+    result = {key: [] for key in list_keys}
+    items = {}
+    async for event, data in events:
+        if event in LIST_EVENTS:
+            data = dict(data)
+            index = data.pop("index")
+            items.setdefault(LIST_EVENTS[event], {})[index] = data
+        else:
+            result[event] = data
+    for key, entries in items.items():
+        result[key] = [entries[i] for i in sorted(entries)]
+    result["partial"] = bool(degraded)
+    if degraded:
+        result["degraded"] = degraded
+    return result
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    """
+    Streams (event, data) pairs as Server-Sent Events, followed by a final
+    "done" event, or an "error" event if the pipeline fails midway. "done"
+    carries the same "partial" / "degraded" markers as collect.
+    """
+    async def body():
+        degraded = resilience.track_degradation()
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            detail = getattr(e, "detail", None) or f"An error occurred: {type(e).__name__} - {e}"
+            yield sse_event("error", {"detail": detail})
+        else:
+            yield sse_event("done", {"partial": True, "degraded": degraded} if degraded else {"partial": False})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
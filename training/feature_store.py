@@ -0,0 +1,180 @@
+# feature_store.py
+"""
+Columnar, memory-mapped copy of the per-domain JSON features in data/features.
+
+Every feature file maps a domain to a list of numbers. They are packed into one
+float32 matrix (one row per domain, the files side by side as column groups)
+saved as a plain .npy next to a small JSON index:
+
+    python feature_store.py
+
+Opening the store maps the matrix read-only, so a row lookup is a view into the
+page cache instead of parsed Python lists, and forked workers share the pages.
+The server reads the outlets' platform presence from it.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+FEATURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "features")
+STORE_DIR = os.getenv(
+    "FEATURE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "feature_store"),
+)
+# Column groups in matrix order; each is data/features/<name>.json.
+FEATURE_GROUPS = (
+    "has_facebook",
+    "has_twitter",
+    "has_wikipedia",
+    "has_youtube",
+    "youtube_numerical",
+    "youtube_nela",
+)
+# Boolean groups telling whether the outlet has an account/page on each platform.
+PRESENCE_GROUPS = {
+    "facebook": "has_facebook",
+    "twitter": "has_twitter",
+    "wikipedia": "has_wikipedia",
+    "youtube": "has_youtube",
+}
+MATRIX_FILE = "features.npy"
+INDEX_FILE = "index.json"
+
+
+def _source_hashes(features_dir: str) -> dict:
+    hashes = {}
+    for name in FEATURE_GROUPS:
+        digest = hashlib.sha256()
+        with open(os.path.join(features_dir, f"{name}.json"), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        hashes[name] = digest.hexdigest()
+    return hashes
+
+
+def convert(features_dir: str = FEATURES_DIR, store_dir: str = STORE_DIR) -> dict:
+    """
+    Packs the JSON feature files into store_dir and returns the written index.
+    Domains missing from a file get NaN in that file's columns.
+    """
+    groups = {}
+    for name in FEATURE_GROUPS:
+        with open(os.path.join(features_dir, f"{name}.json")) as f:
+            groups[name] = json.load(f)
+
+    domains = sorted({domain for values in groups.values() for domain in values})
+    rows = {domain: i for i, domain in enumerate(domains)}
+    columns = {}
+    width = 0
+    for name, values in groups.items():
+        size = max(len(v) for v in values.values())
+        columns[name] = [width, width + size]
+        width += size
+
+    matrix = np.full((len(domains), width), np.nan, dtype=np.float32)
+    for name, values in groups.items():
+        start, stop = columns[name]
+        for domain, vector in values.items():
+            matrix[rows[domain], start:start + len(vector)] = vector
+
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, MATRIX_FILE), matrix)
+    index = {
+        "version": 1,
+        "shape": list(matrix.shape),
+        "columns": columns,
+        "sources_sha256": _source_hashes(features_dir),
+        "domains": domains,
+    }
+    with open(os.path.join(store_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+        f.write("\n")
+    return index
+
+
+def is_stale(features_dir: str = FEATURES_DIR, store_dir: str = STORE_DIR) -> bool:
+    """
+    True if the store is missing or was built from different JSON sources.
+    Compares content hashes, since a checkout doesn't preserve mtimes.
+    """
+    try:
+        with open(os.path.join(store_dir, INDEX_FILE)) as f:
+            built_from = json.load(f).get("sources_sha256")
+    except FileNotFoundError:
+        return True
+    if not os.path.exists(os.path.join(store_dir, MATRIX_FILE)):
+        return True
+    return built_from != _source_hashes(features_dir)
+
+
+class FeatureStore:
+    """
+    Read-only view of a converted store. Rows and column groups come back as
+    views into the memory-mapped matrix; nothing is copied until you index with
+    a list of domains.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        with open(os.path.join(store_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.matrix = np.load(os.path.join(store_dir, MATRIX_FILE), mmap_mode="r")
+        self.columns = {name: slice(start, stop) for name, (start, stop) in index["columns"].items()}
+        self.rows = {domain: i for i, domain in enumerate(index["domains"])}
+        self._presence_columns = [self.columns[group].start for group in PRESENCE_GROUPS.values()]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, domain: str):
+        return domain in self.rows
+
+    def row(self, domain: str, group: str = None):
+        """
+        The feature vector of one domain (optionally one column group), or None.
+        """
+        i = self.rows.get(domain)
+        if i is None:
+            return None
+        return self.matrix[i] if group is None else self.matrix[i, self.columns[group]]
+
+    def take(self, domains: list, group: str = None):
+        """
+        A (len(domains), n) float32 array for known domains, in the given order.
+        """
+        rows = [self.rows[domain] for domain in domains]
+        block = self.matrix[rows]
+        return block if group is None else block[:, self.columns[group]]
+
+    def presence(self, domain: str):
+        """
+        Names of the platforms in PRESENCE_GROUPS the domain is on, or None if
+        the store has no row for it.
+        """
+        i = self.rows.get(domain)
+        if i is None:
+            return None
+        flags = self.matrix[i, self._presence_columns].tolist()
+        return [platform for platform, flag in zip(PRESENCE_GROUPS, flags) if flag > 0]
+
+    def group(self, name: str):
+        """
+        One column group for every domain, as a view.
+        """
+        return self.matrix[:, self.columns[name]]
+
+
+def open_feature_store(store_dir: str = STORE_DIR):
+    """
+    Returns the FeatureStore, or None if it has not been built.
+    """
+    try:
+        return FeatureStore(store_dir)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    index = convert()
+    rows, width = index["shape"]
+    print(f"✅ Wrote {rows} domains x {width} features to {STORE_DIR}")
@@ -1,31 +1,150 @@
 # train.py (Production Model Trainer)
+#
+#   python train.py                  # fit with the default C
+#   python train.py --search         # cross-validated grid search over C, in parallel
+#
+# Writes a versioned bundle to artifacts/<version>/ (compressed, plus an
+# uncompressed copy servers memory-map) and points artifacts/CURRENT at it;
+# running servers pick it up without a restart.
+import argparse
+import hashlib
+import json
+import os
+import time
 import pandas as pd
+import sklearn
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import MultiLabelBinarizer
 from sklearn.svm import LinearSVC
 from sklearn.multiclass import OneVsRestClassifier
+from sklearn.model_selection import GridSearchCV, KFold
 import joblib
+import feature_store
 
-print("Loading the full corpus for training the production model...")
-df =pd.read_csv('data/corpus.tsv', sep='\t')
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(HERE, "data", "corpus.tsv")
+MATRIX_CACHE_DIR = os.path.join(HERE, "data", "cache")
+ARTIFACTS_DIR = os.path.join(HERE, "artifacts")
+BUNDLE_FILE = "bundle.joblib"
+# Uncompressed copy that servers load with mmap_mode, sharing its arrays across workers.
+MMAP_BUNDLE_FILE = "bundle.mmap.joblib"
+MANIFEST_FILE = "manifest.json"
+POINTER_FILE = "CURRENT"
 
-labels = list(zip(df.fact.values, df.bias.values))
-outlets = df.source_url_normalized.values
+VECTORIZER_PARAMS = {"ngram_range": (1, 2), "max_features": 1000}
+DEFAULT_C = 1.0
+SEARCH_C = [0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0]
 
-mlb = MultiLabelBinarizer()
-y_train_mlb = mlb.fit_transform(labels)
 
-vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=1000)
-X_train_tfidf = vectorizer.fit_transform(outlets)
+def corpus_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-print("Training the classification model on all data...")
-clf = OneVsRestClassifier(LinearSVC(random_state=42), n_jobs=-1)
-clf.fit(X_train_tfidf, y_train_mlb)
-print("Training complete.")
 
-print("Saving the production model and vectorizer to files...")
-joblib.dump(clf, 'model.joblib')
-joblib.dump(vectorizer, 'vectorizer.joblib')
-joblib.dump(mlb, 'mlb.joblib') # Save the fitted binarizer
+def vectorize(corpus_sha256: str):
+    """
+    Fits the binarizer and TF-IDF vectorizer, reusing the matrices cached for
+    this exact corpus and vectorizer configuration when they exist.
+    """
+    key = hashlib.sha256(
+        f"{corpus_sha256}:{sorted(VECTORIZER_PARAMS.items())}:{sklearn.__version__}".encode()
+    ).hexdigest()[:16]
+    cache_path = os.path.join(MATRIX_CACHE_DIR, f"{key}.joblib")
+    if os.path.exists(cache_path):
+        print(f"Reusing vectorized corpus from {cache_path}")
+        return joblib.load(cache_path)
 
-print("\n✅ Successfully trained and saved production model files.")
\ No newline at end of file
+    df = pd.read_csv(CORPUS_PATH, sep='\t')
+    labels = list(zip(df.fact.values, df.bias.values))
+    outlets = df.source_url_normalized.values
+
+    mlb = MultiLabelBinarizer()
+    y = mlb.fit_transform(labels)
+    vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+    X = vectorizer.fit_transform(outlets)
+
+    os.makedirs(MATRIX_CACHE_DIR, exist_ok=True)
+    joblib.dump((vectorizer, mlb, X, y), cache_path, compress=3)
+    return vectorizer, mlb, X, y
+
+
+def fit(X, y, search: bool, n_jobs: int, folds: int):
+    if not search:
+        clf = OneVsRestClassifier(LinearSVC(C=DEFAULT_C, random_state=42), n_jobs=n_jobs)
+        clf.fit(X, y)
+        return clf, {"C": DEFAULT_C}, None
+
+    # Parallelize across (C, fold) pairs; the per-label fits inside stay serial.
+    grid = GridSearchCV(
+        OneVsRestClassifier(LinearSVC(random_state=42)),
+        {"estimator__C": SEARCH_C},
+        scoring="f1_samples",
+        cv=KFold(n_splits=folds, shuffle=True, random_state=42),
+        n_jobs=n_jobs,
+        refit=True,
+    )
+    grid.fit(X, y)
+    return grid.best_estimator_, {"C": grid.best_params_["estimator__C"]}, round(grid.best_score_, 4)
+
+
+def write_bundle(bundle: dict, manifest: dict) -> str:
+    version = manifest["version"]
+    out_dir = os.path.join(ARTIFACTS_DIR, version)
+    os.makedirs(out_dir, exist_ok=True)
+    joblib.dump(bundle, os.path.join(out_dir, BUNDLE_FILE), compress=3)
+    joblib.dump(bundle, os.path.join(out_dir, MMAP_BUNDLE_FILE))
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    # Swap the pointer last and atomically so servers never see a half-written bundle.
+    tmp = os.path.join(ARTIFACTS_DIR, f".{POINTER_FILE}.tmp")
+    with open(tmp, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(ARTIFACTS_DIR, POINTER_FILE))
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the source reliability model.")
+    parser.add_argument("--search", action="store_true", help="grid search C with cross-validation")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="parallel workers (-1 = all cores)")
+    args = parser.parse_args()
+
+    # The server reads outlet features from the packed store, so keep it in
+    # step with data/features whenever the model is retrained.
+    if feature_store.is_stale():
+        print("Packing data/features into the binary feature store...")
+        index = feature_store.convert()
+        print(f"Feature store: {index['shape'][0]} domains x {index['shape'][1]} features.")
+
+    print("Loading the full corpus for training the production model...")
+    corpus_sha256 = corpus_hash(CORPUS_PATH)
+    vectorizer, mlb, X, y = vectorize(corpus_sha256)
+
+    print("Training the classification model on all data...")
+    start = time.perf_counter()
+    clf, params, cv_score = fit(X, y, args.search, args.n_jobs, args.folds)
+    print(f"Training complete in {time.perf_counter() - start:.1f}s (C={params['C']}, cv f1={cv_score}).")
+
+    version = time.strftime("%Y%m%dT%H%M%S") + "-" + corpus_sha256[:8]
+    manifest = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "corpus_sha256": corpus_sha256,
+        "samples": int(X.shape[0]),
+        "labels": list(mlb.classes_),
+        "vectorizer": {k: list(v) if isinstance(v, tuple) else v for k, v in VECTORIZER_PARAMS.items()},
+        "params": params,
+        "cv_f1_samples": cv_score,
+        "sklearn_version": sklearn.__version__,
+    }
+    out_dir = write_bundle({"model": clf, "vectorizer": vectorizer, "mlb": mlb}, manifest)
+    print(f"\n✅ Saved model bundle {version} to {out_dir} and marked it current.")
+
+
+if __name__ == "__main__":
+    main()
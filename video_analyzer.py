@@ -4,54 +4,145 @@ import os
 from urllib.parse import urlparse, parse_qs
 from youtube_transcript_api import YouTubeTranscriptApi, _errors
 #from youtube_transcript_api.exceptions import NoTranscriptFound, TranscriptsDisabled
-import yt_dlp
 import io
-from pydub import AudioSegment
+import hashlib
 import tempfile
-import torch
+import threading
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
 #from insanely_fast_whisper import WhisperModel
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 from fastapi import FastAPI, HTTPException
-import cv2
 import base64
 import asyncio
 from dotenv import load_dotenv
 from PIL import Image
-import google.generativeai as genai
+import keyframes
+import metrics
+import resilience
+from cache import SQLiteCache, CACHE_PATH
+from concurrency import WORKER_PROCESSES, stage_limits
+# torch, transformers, cv2 and yt_dlp are imported on first use so that
+# text-only workers never pay for them. Start a worker with WORKER_ROLE=video
+# to load everything up front instead.
+
 # --- Configuration for Speech-to-Text Model ---
 
 #The "small" model is a good balance of speed and accuracy for this use case.
-MODEL_NAME = "openai/whisper-small"
-device = "cuda:0" if torch.cuda.is_available() else "cpu"
-dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+MODEL_NAME = os.getenv("ASR_MODEL", "openai/whisper-small")
+# Optional faster model (e.g. openai/whisper-base) for clips up to ASR_SHORT_CLIP_SECONDS.
+ASR_SHORT_MODEL = os.getenv("ASR_SHORT_MODEL", "")
+ASR_SHORT_CLIP_SECONDS = float(os.getenv("ASR_SHORT_CLIP_SECONDS", "60"))
+# CPU mode: int8 dynamic quantization of the Linear layers, and long audio cut
+# into 30 s windows decoded in batches instead of one after another.
+ASR_QUANTIZE = os.getenv("ASR_QUANTIZE", "1") == "1"
+ASR_CHUNK_LENGTH_S = int(os.getenv("ASR_CHUNK_LENGTH_S", "30"))
+ASR_BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "8"))
+# Torch intra-op threads; 0 keeps torch's default (all cores). With several
+# worker processes each gets its share of the cores, so concurrent
+# transcriptions in different workers don't oversubscribe the CPU.
+ASR_THREADS = int(os.getenv(
+    "ASR_THREADS",
+    str(max(1, (os.cpu_count() or 1) // WORKER_PROCESSES)) if WORKER_PROCESSES > 1 else "0",
+))
+SAMPLE_RATE = 16000
+WORKER_ROLE = os.getenv("WORKER_ROLE", "text")
+# "remote" seeks keyframes straight from the resolved stream; "download" fetches the whole file first.
+KEYFRAME_MODE = os.getenv("KEYFRAME_MODE", "remote")
+KEYFRAME_FETCH_CONCURRENCY = int(os.getenv("KEYFRAME_FETCH_CONCURRENCY", "4"))
+# "inline" returns each keyframe as base64 in the response; "ref" returns an id
+# clients fetch from GET /v2/keyframes/{id}, which browsers can cache.
+KEYFRAME_DELIVERY = os.getenv("KEYFRAME_DELIVERY", "inline")
 
+load_dotenv()
 
-model = AutoModelForSpeechSeq2Seq.from_pretrained(
-    MODEL_NAME, dtype=dtype, low_cpu_mem_usage=True, use_safetensors=True
+# Transcripts keyed by "youtube:<video id>" or "<yt-dlp extractor>:<id>", with
+# their chunk timestamps. Viral clips get resubmitted constantly.
+transcript_cache = SQLiteCache(
+    CACHE_PATH,
+    "transcripts",
+    ttl=int(os.getenv("TRANSCRIPT_CACHE_TTL", str(30 * 24 * 3600))),
+    max_bytes=int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "256")) * 1024 * 1024,
 )
-model.to(device)
 
+# Encoded keyframe thumbnails keyed by their content hash, for "ref" delivery.
+keyframe_store = SQLiteCache(
+    CACHE_PATH,
+    "keyframes",
+    ttl=int(os.getenv("KEYFRAME_STORE_TTL", str(7 * 24 * 3600))),
+    max_bytes=int(os.getenv("KEYFRAME_STORE_MAX_MB", "256")) * 1024 * 1024,
+)
 
+_load_lock = threading.Lock()
+_pipes = {}
+_vision_model = None
 
-processor = AutoProcessor.from_pretrained(MODEL_NAME)
 
-pipe = pipeline(
-    "automatic-speech-recognition",
-    model=model,
-    tokenizer=processor.tokenizer,
-    feature_extractor=processor.feature_extractor,
-    max_new_tokens=128,
-    dtype=dtype,
-    device=device,
-)
-load_dotenv()
-try:
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-    
-except KeyError as e:
-    print(f"Error: Environment variable {e} not found.")
-    exit()
-vision_model = genai.GenerativeModel('gemini-2.5-pro')
+def get_asr_pipeline(model_name: str = MODEL_NAME):
+    """
+    Builds the Whisper ASR pipeline for `model_name` on first call and returns
+    the shared instance. On CPU the model is dynamically quantized to int8.
+    """
+    pipe = _pipes.get(model_name)
+    if pipe is not None:
+        return pipe
+    with _load_lock:
+        if model_name not in _pipes:
+            import torch
+            from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+
+            device = "cuda:0" if torch.cuda.is_available() else "cpu"
+            dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+            if ASR_THREADS > 0:
+                torch.set_num_threads(ASR_THREADS)
+
+            model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                model_name, dtype=dtype, low_cpu_mem_usage=True, use_safetensors=True
+            )
+            model.to(device)
+            if device == "cpu" and ASR_QUANTIZE:
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+            processor = AutoProcessor.from_pretrained(model_name)
+
+            _pipes[model_name] = pipeline(
+                "automatic-speech-recognition",
+                model=model,
+                tokenizer=processor.tokenizer,
+                feature_extractor=processor.feature_extractor,
+                max_new_tokens=128,
+                dtype=dtype,
+                device=device,
+            )
+    return _pipes[model_name]
+
+
+def get_vision_model():
+    global _vision_model
+    if _vision_model is None:
+        import google.generativeai as genai
+        try:
+            genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+        except KeyError as e:
+            raise RuntimeError(f"Environment variable {e} not found.")
+        _vision_model = genai.GenerativeModel('gemini-2.5-pro')
+    return _vision_model
+
+
+def preload():
+    """
+    Loads the speech model, OpenCV and the vision client eagerly. Called at
+    startup by workers running with WORKER_ROLE=video.
+    """
+    import cv2
+    import yt_dlp
+    get_asr_pipeline()
+    if ASR_SHORT_MODEL:
+        get_asr_pipeline(ASR_SHORT_MODEL)
+    get_vision_model()
+
 
 # --- Helper Functions ---
 def extract_video_id(url: str) -> str:
@@ -62,49 +153,185 @@ def extract_video_id(url: str) -> str:
         return parse_qs(parsed_url.query).get("v", [None])[0]
     return None
 
-async def get_visual_context(video_path: str, num_keyframes: int = 3):
+@dataclass
+class MediaAsset:
     """
-    Extracts keyframes from a video and prepares them for analysis.
+    Everything the analysis needs from one acquisition of a video URL: either a
+    downloaded file or the direct stream URLs resolved by yt-dlp.
     """
-    keyframes = []
+    video_path: Optional[str] = None
+    stream_url: Optional[str] = None
+    audio_url: Optional[str] = None
+    http_headers: dict = field(default_factory=dict)
+    audio: Optional[np.ndarray] = None  # 16 kHz mono float32 samples
+    media_id: Optional[str] = None
+    extractor: Optional[str] = None
+    duration: Optional[float] = None
+    # How the transcript was obtained: {"source": "captions" | "cache" | "asr"}, plus ASR stats.
+    transcription: dict = field(default_factory=dict)
+
+    def cleanup(self):
+        if self.video_path and os.path.exists(self.video_path):
+            os.remove(self.video_path)
+
+
+def _ffmpeg_input(source: str, http_headers: dict = None, seek: float = None) -> list:
+    args = []
+    if seek is not None:
+        # Input seeking: ffmpeg jumps straight to the nearest keyframe, so a remote
+        # stream is only read around the timestamp instead of from the start.
+        args += ['-ss', f'{seek:.3f}']
+    if source.startswith('http'):
+        # Give up on a stalled connection instead of blocking the worker forever.
+        args += ['-rw_timeout', str(int(resilience.MEDIA_SOCKET_TIMEOUT * 1_000_000))]
+        if http_headers:
+            args += ['-headers', ''.join(f'{k}: {v}\r\n' for k, v in http_headers.items())]
+    return args + ['-i', source]
+
+
+def _read_local_frames(video_path: str, positions: list) -> list:
+    import cv2
+
     video = cv2.VideoCapture(video_path)
     if not video.isOpened():
         return []
-
-    # Simple keyframe extraction: grab frames at 25%, 50%, and 75% of the video
     total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-    positions = [0.25, 0.50, 0.75]
-    tasks = []
+    frames = []
     for pos in positions:
-        frame_id = int(total_frames * pos)
-        video.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+        video.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * pos))
         ret, frame = video.read()
         if ret:
             # Encode the frame as a JPEG image in memory
             _, buffer = cv2.imencode('.jpg', frame)
-            pil_img = Image.open(io.BytesIO(buffer))
-
-             # Create a task for the AI to analyze this frame
-            prompt = "Analyze this image from a video. Describe the key visual elements. Is this image related to a known news event? If so, state the context and original date of the event."
-            task = vision_model.generate_content_async([prompt, pil_img])
-            tasks.append((buffer, task)) # Store buffer for base64 encoding later
-            # Convert to base64 to easily send in JSON
-            
-    
+            frames.append(buffer.tobytes())
     video.release()
-    results = []
-    responses = await asyncio.gather(*[task for _, task in tasks])
-    
-    for (buffer, response) in zip(tasks, responses):
-        jpg_as_text = base64.b64encode(buffer[0]).decode('utf-8')
-        results.append({
-            "keyframe_base64": jpg_as_text,
-            "context": response.text
-        })
-        
-    return results
-
-def get_transcript_from_youtube(video_url: str) -> str:
+    return frames
+
+
+async def fetch_remote_frame(media: MediaAsset, timestamp: float):
+    """
+    Grabs the single frame at `timestamp` from the remote stream as JPEG bytes,
+    fetching only the segment around it.
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
+        *_ffmpeg_input(media.stream_url, media.http_headers, seek=timestamp),
+        '-frames:v', '1', '-f', 'image2pipe', '-c:v', 'mjpeg', '-q:v', '3', 'pipe:1',
+    ]
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await resilience.with_timeout(process.communicate(), resilience.KEYFRAME_FETCH_TIMEOUT)
+    except TimeoutError:
+        process.kill()
+        await process.wait()
+        print(f"Keyframe fetch at {timestamp:.1f}s timed out.")
+        return None
+    if process.returncode != 0 or not stdout:
+        print(f"Keyframe fetch at {timestamp:.1f}s failed: {stderr.decode(errors='replace').strip()}")
+        return None
+    return stdout
+
+
+async def select_frames(media: MediaAsset, num_keyframes: int = 3) -> list:
+    """
+    Returns the JPEG bytes of the keyframes to analyze, in temporal order.
+    """
+    with metrics.timed("keyframes"):
+        return await _select_frames(media, num_keyframes)
+
+
+async def _select_frames(media: MediaAsset, num_keyframes: int) -> list:
+    # Sample candidate frames across the whole video, then keep only the most
+    # visually distinct ones so blank frames and repeated shots never reach the
+    # vision model.
+    if media.video_path:
+        positions = keyframes.sample_positions()
+        frames = await asyncio.to_thread(_read_local_frames, media.video_path, positions)
+    elif media.stream_url and media.duration:
+        positions = keyframes.sample_positions(keyframes.KEYFRAME_REMOTE_SAMPLES)
+        limit = asyncio.Semaphore(KEYFRAME_FETCH_CONCURRENCY)
+
+        async def fetch(pos):
+            async with limit:
+                return await fetch_remote_frame(media, media.duration * pos)
+
+        fetched = await asyncio.gather(*[fetch(pos) for pos in positions])
+        frames = [frame for frame in fetched if frame]
+    else:
+        return []
+
+    chosen = await asyncio.to_thread(keyframes.select_keyframes, frames, num_keyframes)
+    return [frames[i] for i in chosen]
+
+
+def encode_keyframe(frame: bytes) -> dict:
+    """
+    The client-facing part of a keyframe item: a thumbnail either inline as
+    base64 or, in "ref" delivery, stored under its content hash and referenced
+    by id and URL.
+    """
+    data, mime = keyframes.encode_thumbnail(frame)
+    encoded = base64.b64encode(data).decode('utf-8')
+    if KEYFRAME_DELIVERY != "ref":
+        return {"keyframe_base64": encoded, "keyframe_mime": mime}
+    keyframe_id = hashlib.sha256(data).hexdigest()[:32]
+    keyframe_store.set(keyframe_id, {"mime": mime, "data": encoded})
+    return {"keyframe_id": keyframe_id, "keyframe_url": f"/v2/keyframes/{keyframe_id}", "keyframe_mime": mime}
+
+
+def get_keyframe(keyframe_id: str):
+    """
+    Returns (bytes, mime type) of a stored keyframe thumbnail, or None.
+    """
+    entry = keyframe_store.get(keyframe_id)
+    if entry is None:
+        return None
+    return base64.b64decode(entry["data"]), entry["mime"]
+
+
+async def stream_visual_context(media: MediaAsset, num_keyframes: int = 3):
+    """
+    Extracts keyframes from a video and yields ("keyframe", item) for each one
+    as soon as its vision analysis comes back. Items carry their temporal index.
+    """
+    frames = await select_frames(media, num_keyframes)
+    vision_model = get_vision_model()
+    prompt = "Analyze this image from a video. Describe the key visual elements. Is this image related to a known news event? If so, state the context and original date of the event."
+
+    async def describe(index, frame):
+        try:
+            async with stage_limits.slot("gemini"):
+                with metrics.timed("gemini_vision"):
+                    response = await resilience.gemini.call(
+                        lambda: vision_model.generate_content_async([prompt, Image.open(io.BytesIO(frame))]),
+                        resilience.VISION_TIMEOUT,
+                    )
+            metrics.record_gemini_usage(vision_model, response)
+            context = response.text
+        except Exception as e:
+            # The frame is still worth showing without its description.
+            resilience.degrade("visual_context", e)
+            context = None
+        # The vision model sees the full frame; clients get a small thumbnail,
+        # encoded off the event loop.
+        encoded = await asyncio.to_thread(encode_keyframe, frame)
+        return {"index": index, **encoded, "context": context}
+
+    for next_item in asyncio.as_completed([describe(i, frame) for i, frame in enumerate(frames)]):
+        yield "keyframe", await next_item
+
+
+async def get_visual_context(media: MediaAsset, num_keyframes: int = 3):
+    """
+    Extracts keyframes from a video and returns their analyses in temporal order.
+    """
+    items = [item async for _, item in stream_visual_context(media, num_keyframes)]
+    items.sort(key=lambda item: item["index"])
+    return [{key: value for key, value in item.items() if key != "index"} for item in items]
+
+def get_transcript_from_youtube(video_url: str) -> dict:
     video_id = extract_video_id(video_url)
     if not video_id:
         raise ValueError("Invalid YouTube URL or missing video ID.")
@@ -122,89 +349,252 @@ def get_transcript_from_youtube(video_url: str) -> str:
             transcript = transcript_list.find_generated_transcript(available_langs)
 
         fetched = transcript.fetch()
-        transcript_text = " ".join([snippet.text for snippet in fetched])
-        return transcript_text
+        chunks = [
+            {"text": snippet.text, "start": snippet.start, "end": snippet.start + snippet.duration}
+            for snippet in fetched
+        ]
+        return {"text": " ".join([chunk["text"] for chunk in chunks]), "chunks": chunks}
 
     except _errors.NoTranscriptFound:
         raise HTTPException(status_code=404, detail="Transcript not found for this video.")
+    except OSError:
+        # Network trouble (requests' errors are OSErrors): let the caller's breaker see it.
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcript fetch failed: {type(e).__name__} - {e}")
 
 
-def get_transcript_from_other_platforms(video_url: str) -> str:
+def download_media(url: str, with_audio: bool = True) -> MediaAsset:
     """
-    Downloads audio from any yt-dlp supported URL and transcribes it.
+    Downloads a URL once as a 480p MP4 (video only when the audio isn't needed).
     """
-    # Define a specific output template for our audio file in the temp directory
+    import yt_dlp
+
     output_template = os.path.join(tempfile.gettempdir(), '%(id)s.%(ext)s')
-    
     ydl_opts = {
-        'format': 'bestaudio/best',
+        'format': (
+            'bestvideo[height<=480]+bestaudio/best[height<=480]/best'
+            if with_audio else 'bestvideo[height<=480]/best[height<=480]/best'
+        ),
         'outtmpl': output_template,
-        'return_timestamps':True,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-            
-        }],
-        'quiet': True, # Suppress console output from yt-dlp
-        
+        'quiet': True,
+        'merge_output_format': 'mp4',
+        'socket_timeout': resilience.MEDIA_SOCKET_TIMEOUT,
     }
-    
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(video_url, download=True)
-        
-        base_filename = os.path.splitext(ydl.prepare_filename(info_dict))[0]
-        audio_file_path = base_filename + '.mp3'
-        
-    try:
-        if not os.path.exists(audio_file_path):
-             raise FileNotFoundError(f"FFmpeg failed to create the audio file: {audio_file_path}")
-
-        #segments, _ = whisper_model.transcribe(audio_file_path, beam_size=5)
-        result = pipe(audio_file_path, return_timestamps=True)
-        transcript_text = " ".join([chunk['text'] for chunk in result['chunks']])
-        return transcript_text
-    finally:
-        # Clean up the downloaded audio file
-        if os.path.exists(audio_file_path):
-            os.remove(audio_file_path)
-
-def download_video(url):
-    output_template = os.path.join(tempfile.gettempdir(), '%(id)s.%(ext)s')
-    ydl_opts = {
-    'format': 'bestvideo[height<=480]+bestaudio/best/best',
-    'outtmpl': output_template,
-    'quiet': True,
-    'merge_output_format': 'mp4',
-    'postprocessors': [{
-        'key': 'FFmpegVideoConvertor',
-        'preferedformat': 'mp4'
-    }]
-}
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
             info_dict = ydl.extract_info(url, download=True)
-            return ydl.prepare_filename(info_dict)
         except yt_dlp.utils.DownloadError as e:
             raise HTTPException(status_code=500, detail=f"Video download failed: {str(e)}")
+        downloads = info_dict.get('requested_downloads') or [{}]
+        video_path = downloads[0].get('filepath') or ydl.prepare_filename(info_dict)
+
+    return MediaAsset(
+        video_path=video_path,
+        media_id=info_dict.get('id'),
+        extractor=info_dict.get('extractor_key'),
+        duration=info_dict.get('duration'),
+    )
+
+
+def resolve_media(url: str) -> MediaAsset:
+    """
+    Resolves the direct stream URLs of a video with yt-dlp without downloading it.
+    """
+    import yt_dlp
+
+    ydl_opts = {
+        'format': 'bestvideo[height<=480]+bestaudio/best[height<=480]/best',
+        'quiet': True,
+        'socket_timeout': resilience.MEDIA_SOCKET_TIMEOUT,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        try:
+            info_dict = ydl.extract_info(url, download=False)
+        except yt_dlp.utils.DownloadError as e:
+            raise HTTPException(status_code=500, detail=f"Video lookup failed: {str(e)}")
+
+    # Split formats list the video and audio streams separately; progressive
+    # formats carry both in info_dict['url'].
+    formats = info_dict.get('requested_formats') or [info_dict]
+    video_format = next((f for f in formats if f.get('vcodec') != 'none'), formats[0])
+    audio_format = next((f for f in formats if f.get('acodec') != 'none'), video_format)
+    return MediaAsset(
+        stream_url=video_format.get('url'),
+        audio_url=audio_format.get('url'),
+        http_headers=video_format.get('http_headers') or info_dict.get('http_headers') or {},
+        media_id=info_dict.get('id'),
+        extractor=info_dict.get('extractor_key'),
+        duration=info_dict.get('duration'),
+    )
+
+
+def decode_audio(source: str, http_headers: dict = None) -> np.ndarray:
+    """
+    Decodes the audio track of a local file or remote stream straight to the
+    16 kHz mono float32 buffer Whisper expects, without writing an audio file.
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', *_ffmpeg_input(source, http_headers),
+        '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 'f32le', 'pipe:1',
+    ]
+    try:
+        # Bounded by the request deadline (threads inherit it); run() kills ffmpeg on expiry.
+        result = subprocess.run(command, capture_output=True, timeout=resilience.stage_timeout())
+    except subprocess.TimeoutExpired:
+        raise resilience.DeadlineExceeded("Request deadline exceeded while decoding audio.")
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed to decode audio: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def transcribe_audio(audio: np.ndarray):
+    """
+    Returns the transcript ({"text", "chunks"}) and the ASR stats of this run:
+    model, audio and processing seconds, and the real-time factor.
+    """
+    if audio is None or audio.size == 0:
+        return {"text": "", "chunks": []}, None
+    audio_seconds = audio.size / SAMPLE_RATE
+    model_name = ASR_SHORT_MODEL if ASR_SHORT_MODEL and audio_seconds <= ASR_SHORT_CLIP_SECONDS else MODEL_NAME
+    start = time.perf_counter()
+    #segments, _ = whisper_model.transcribe(audio_file_path, beam_size=5)
+    result = get_asr_pipeline(model_name)(
+        {"raw": audio, "sampling_rate": SAMPLE_RATE},
+        return_timestamps=True,
+        chunk_length_s=ASR_CHUNK_LENGTH_S,
+        batch_size=ASR_BATCH_SIZE,
+    )
+    elapsed = time.perf_counter() - start
+    chunks = [
+        {"text": chunk['text'], "start": chunk['timestamp'][0], "end": chunk['timestamp'][1]}
+        for chunk in result['chunks']
+    ]
+    stats = {
+        "model": model_name,
+        "audio_seconds": round(audio_seconds, 2),
+        "processing_seconds": round(elapsed, 2),
+        "real_time_factor": round(elapsed / audio_seconds, 3),
+    }
+    print(f"ASR {model_name}: {audio_seconds:.1f}s of audio in {elapsed:.1f}s (RTF {stats['real_time_factor']}).")
+    return {"text": " ".join([chunk['text'] for chunk in chunks]), "chunks": chunks}, stats
+
+
+def acquire_media(url: str, with_audio: bool = True, asset: MediaAsset = None, resolve: bool = True) -> MediaAsset:
+    """
+    Single acquisition stage for a video URL. In "remote" keyframe mode only the
+    stream URLs are resolved: audio is streamed through ffmpeg and keyframes are
+    fetched later by seeking, so nothing proportional to the video's length hits
+    the disk. Otherwise (or when the stream can't be seeked) the URL is
+    downloaded once and both the audio and the keyframes come from that file.
+    `asset` may be a result of resolve_media the caller already has; with
+    `resolve` false the caller already tried, so a missing `asset` goes
+    straight to the download.
+    """
+    if KEYFRAME_MODE == "remote":
+        if asset is None and resolve:
+            try:
+                asset = resolve_media(url)
+            except HTTPException:
+                asset = None
+        if asset and asset.stream_url and asset.duration:
+            if with_audio:
+                asset.audio = decode_audio(asset.audio_url, asset.http_headers)
+            return asset
+
+    asset = download_media(url, with_audio=with_audio)
+    if with_audio:
+        try:
+            asset.audio = decode_audio(asset.video_path)
+        except Exception:
+            asset.cleanup()
+            raise
+    return asset
+
+def _discard(future):
+    # A download that finished after its request gave up on it still left a file behind.
+    if not future.cancelled() and future.exception() is None and isinstance(future.result(), MediaAsset):
+        future.result().cleanup()
+
+
+async def _run_stage(abandoned: list, fn, *args):
+    """
+    Runs blocking `fn` in a thread for at most what is left of the request
+    deadline. The thread itself can't be stopped: once given up on it goes into
+    `abandoned` (the list yielded by the stage slot, which stays taken until the
+    thread ends), and a MediaAsset it still returns is cleaned up.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+    try:
+        return await resilience.with_timeout(asyncio.shield(future))
+    except BaseException:
+        future.add_done_callback(_discard)
+        abandoned.append(future)
+        raise
+
 # --- Main Function for this Module ---
 
-def analyze_video_url(url: str) -> str:
+async def analyze_video_url(url: str):
     """
     Main function that analyzes a video URL, determines the platform,
-    and returns the transcript text.
+    and returns the transcript text and the acquired MediaAsset. The caller
+    must call asset.cleanup() once the keyframes have been read.
+    Network fetches and Whisper each wait for a slot in their stage limit, and
+    none of them runs past the request deadline. The transcript
+    cache is SQLite shared by every worker, so it is read and written in a
+    thread too.
     """
-    hostname = urlparse(url).hostname
-    
-    # If it's a YouTube video, use the fast API method
+    hostname = urlparse(url).hostname or ""
+
+    # If it's a YouTube video, use the fast API method and only fetch video frames
     if "youtube.com" in hostname or "youtu.be" in hostname:
         print("YouTube URL detected, using transcript API.")
-        return get_transcript_from_youtube(url),download_video(url)
-    else:
-        # For any other platform, use the download-and-transcribe method
-        print(f"Non-YouTube URL detected ({hostname}), using local transcription.")
-        
-        return get_transcript_from_other_platforms(url),download_video(url)
\ No newline at end of file
+        cache_key = f"youtube:{extract_video_id(url)}"
+        transcript = await asyncio.to_thread(transcript_cache.get, cache_key)
+        source = "cache"
+        async with stage_limits.slot("download") as abandoned:
+            if transcript is None:
+                with metrics.timed("transcript_api"):
+                    transcript = await resilience.youtube_transcripts.call(
+                        lambda: asyncio.to_thread(get_transcript_from_youtube, url)
+                    )
+                await asyncio.to_thread(transcript_cache.set, cache_key, transcript)
+                source = "captions"
+            with metrics.timed("download"):
+                asset = await _run_stage(abandoned, acquire_media, url, False)
+        asset.transcription = {"source": source}
+        return transcript["text"], asset
+
+    # For any other platform, transcribe the audio of the same acquisition.
+    # Resolving first gives us the extractor and id to look the transcript up by,
+    # so a cache hit skips the audio download and ASR entirely.
+    print(f"Non-YouTube URL detected ({hostname}), using local transcription.")
+    async with stage_limits.slot("download") as abandoned:
+        try:
+            with metrics.timed("resolve"):
+                resolved = await _run_stage(abandoned, resolve_media, url)
+        except HTTPException:
+            resolved = None
+        cache_key = f"{resolved.extractor}:{resolved.media_id}" if resolved and resolved.media_id else None
+        transcript = await asyncio.to_thread(transcript_cache.get, cache_key) if cache_key else None
+        if transcript is not None:
+            with metrics.timed("download"):
+                asset = await _run_stage(abandoned, acquire_media, url, False, resolved, False)
+            asset.transcription = {"source": "cache"}
+            return transcript["text"], asset
+        with metrics.timed("download"):
+            asset = await _run_stage(abandoned, acquire_media, url, True, resolved, False)
+
+    try:
+        async with stage_limits.slot("asr") as abandoned:
+            with metrics.timed("asr"):
+                transcript, asr_stats = await _run_stage(abandoned, transcribe_audio, asset.audio)
+    except BaseException:
+        asset.cleanup()
+        raise
+    asset.audio = None
+    asset.transcription = {"source": "asr", **(asr_stats or {})}
+    if cache_key:
+        await asyncio.to_thread(transcript_cache.set, cache_key, transcript)
+    return transcript["text"], asset